@@ -10,12 +10,17 @@ REAL TRADING BOT - Live Breeze Connect Implementation
 
 import sqlite3
 import os
+import itertools
+import queue
+import atexit
+import time as time_module
 from datetime import datetime, timedelta, time
 import asyncio
 import logging
-from collections import deque
+import numpy as np
+from pathlib import Path
 from dotenv import load_dotenv
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 # Setup logging
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -25,11 +30,16 @@ logger.setLevel(logging.INFO)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(log_formatter)
 console_handler.stream.reconfigure(encoding='utf-8')
-logger.addHandler(console_handler)
 
 file_handler = RotatingFileHandler('real_trader.log', maxBytes=10*1024*1024, backupCount=5, encoding='utf-8')
 file_handler.setFormatter(log_formatter)
-logger.addHandler(file_handler)
+
+# Console/file I/O runs on the listener thread, not the trading event loop
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, console_handler, file_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 logger.propagate = False
 
@@ -49,24 +59,71 @@ sys.path.append(BASE_DIR)
 from super_pranni_monitor import FixedPranniMonitor
 
 
+class _MockBreeze:
+    """Simulated Breeze client for paper trading (static responses, counter-based order ids)"""
+    
+    PAPER_LTP = 100.0
+    _QUOTE_RESPONSE = {'Success': [{'ltp': PAPER_LTP}]}
+    _ORDER_DETAIL_RESPONSE = {'Success': [{'status': 'Executed'}]}
+    _POSITIONS_RESPONSE = {'Success': []}
+    
+    def __init__(self):
+        self._session_stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        self._order_ids = itertools.count(1)
+    
+    def _next_order_id(self, prefix):
+        return f'{prefix}{self._session_stamp}{next(self._order_ids):04d}'
+    
+    def place_order(self, *args, **kwargs):
+        return {'Success': {'order_id': self._next_order_id('PAPER'), 'message': 'Paper order placed'}}
+    
+    def square_off(self, *args, **kwargs):
+        return {'Success': {'order_id': self._next_order_id('PAPEREX'), 'message': 'Paper exit placed'}}
+    
+    def get_quotes(self, *args, **kwargs):
+        return self._QUOTE_RESPONSE
+    
+    def get_order_detail(self, *args, **kwargs):
+        return self._ORDER_DETAIL_RESPONSE
+    
+    def get_portfolio_positions(self, *args, **kwargs):
+        return self._POSITIONS_RESPONSE
+
+
 class SafeAPIManager:
     """Manages API calls to NEVER exceed 95 per minute"""
     
+    WINDOW_SECONDS = 60
+    
     def __init__(self, max_calls_per_minute=95):
         self.max_calls_per_minute = max_calls_per_minute
-        self.call_history = deque()
+        # Fixed-size ring of time.monotonic() call times (oldest at _head, always sorted)
+        self._ring_size = max(128, max_calls_per_minute)
+        self._ring = np.empty(self._ring_size, dtype=np.float64)
+        self._head = 0
+        self._count = 0
         self.total_session_calls = 0
         logger.info(f"ðŸ›¡ï¸ Safe API Manager: {max_calls_per_minute} calls/minute limit")
     
+    def _expire_old_calls(self):
+        """Drop calls older than the 60-second window, return current window usage"""
+        if self._count:
+            cutoff = time_module.monotonic() - self.WINDOW_SECONDS
+            end = self._head + self._count
+            if end <= self._ring_size:
+                expired = int(np.searchsorted(self._ring[self._head:end], cutoff))
+            else:
+                first = self._ring[self._head:]
+                expired = int(np.searchsorted(first, cutoff))
+                if expired == len(first):
+                    expired += int(np.searchsorted(self._ring[:end - self._ring_size], cutoff))
+            self._head = (self._head + expired) % self._ring_size
+            self._count -= expired
+        return self._count
+    
     def can_make_api_call(self):
         """Check if we can make an API call safely"""
-        now = datetime.now()
-        
-        # Remove calls older than 60 seconds
-        while self.call_history and (now - self.call_history[0]).total_seconds() > 60:
-            self.call_history.popleft()
-        
-        current_minute_calls = len(self.call_history)
+        current_minute_calls = self._expire_old_calls()
         
         if current_minute_calls >= self.max_calls_per_minute:
             logger.warning(f"âš ï¸ API limit reached: {current_minute_calls}/{self.max_calls_per_minute}")
@@ -76,14 +133,19 @@ class SafeAPIManager:
     
     def record_api_call(self, call_type="general"):
         """Record an API call"""
-        now = datetime.now()
-        self.call_history.append(now)
+        if self._count == self._ring_size:
+            # Ring full - overwrite the oldest entry
+            self._head = (self._head + 1) % self._ring_size
+            self._count -= 1
+        self._ring[(self._head + self._count) % self._ring_size] = time_module.monotonic()
+        self._count += 1
         self.total_session_calls += 1
         
-        current_usage = len(self.call_history)
+        current_usage = self._count
         remaining = self.max_calls_per_minute - current_usage
         
-        logger.debug(f"ðŸ“¡ API Call #{current_usage}/{self.max_calls_per_minute} ({call_type}) - {remaining} remaining")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"ðŸ“¡ API Call #{current_usage}/{self.max_calls_per_minute} ({call_type}) - {remaining} remaining")
     
     async def safe_api_call(self, api_function, call_type="general", *args, **kwargs):
         """Make API call with automatic throttling"""
@@ -105,13 +167,8 @@ class SafeAPIManager:
     
     def get_usage_stats(self):
         """Get current API usage statistics"""
-        now = datetime.now()
-        
         # Remove old calls
-        while self.call_history and (now - self.call_history[0]).total_seconds() > 60:
-            self.call_history.popleft()
-        
-        current_minute_usage = len(self.call_history)
+        current_minute_usage = self._expire_old_calls()
         remaining_calls = self.max_calls_per_minute - current_minute_usage
         
         return {
@@ -139,6 +196,26 @@ class RealTrader:
         self.lot_size = 75  # NIFTY lot size
         self.target_per_lot = 10  # â‚¹10 profit target
         self.sl_consecutive_candles = 1  # Stop-loss after 1 consecutive candle
+        self.quantity_str = str(self.lot_size)
+        
+        # Breeze contract kwargs (expiry_date/right/strike_price) per open trade id
+        self._trade_contracts = {}
+        
+        # Open trades list, reset to None whenever this trader opens/closes a trade and
+        # reloaded whenever paper_trades.db changes (emergency_exit.py and
+        # close_paper_positions.py close trades from their own processes)
+        self._open_trades_cache = None
+        self._open_trades_version = None
+        
+        # Long-lived connection to paper_trades.db (opened lazily) - PRAGMA data_version
+        # is only comparable across reads on the same connection
+        self._conn_trades = None
+        
+        # Latest data_5min candle each open trade was last SL-checked against
+        self._sl_checked_candle = {}
+        
+        # Read-only, memory-mapped connection to the 5-min candle DB (opened lazily)
+        self._conn_5min_ro = None
         
         # Breeze connection
         self.breeze = None
@@ -158,13 +235,7 @@ class RealTrader:
         try:
             if self.paper_trading:
                 logger.info("ðŸ“ PAPER TRADING: Using simulated Breeze connection")
-                self.breeze = type('MockBreeze', (), {
-                    'place_order': lambda *args, **kwargs: {'Success': {'order_id': f'PAPER{datetime.now().strftime("%Y%m%d%H%M%S")}', 'message': 'Paper order placed'}},
-                    'square_off': lambda *args, **kwargs: {'Success': {'order_id': f'PAPEREX{datetime.now().strftime("%Y%m%d%H%M%S")}', 'message': 'Paper exit placed'}},
-                    'get_quotes': lambda *args, **kwargs: {'Success': [{'ltp': 100.0}]},
-                    'get_order_detail': lambda *args, **kwargs: {'Success': [{'status': 'Executed'}]},
-                    'get_portfolio_positions': lambda *args, **kwargs: {'Success': []}
-                })()
+                self.breeze = _MockBreeze()
                 logger.info("âœ… Simulated Breeze connection established")
                 return True
             
@@ -200,31 +271,54 @@ class RealTrader:
         expiry = today + timedelta(days=days_ahead)
         return expiry.strftime("%Y-%m-%dT06:00:00.000Z")
     
-    async def get_option_premium(self, strike, direction):
+    def build_contract_kwargs(self, strike, direction):
+        """Breeze option contract kwargs for a strike/direction at the current expiry"""
+        return {
+            'expiry_date': self.get_next_expiry(),
+            'right': "call" if direction == "CALL" else "put",
+            'strike_price': str(strike)
+        }
+    
+    def get_trade_contract(self, trade_id, strike, direction):
+        """Contract kwargs stored when the trade was placed (rebuilt if not cached, e.g. after restart)"""
+        contract = self._trade_contracts.get(trade_id)
+        if contract is None:
+            contract = self._trade_contracts[trade_id] = self.build_contract_kwargs(strike, direction)
+        return contract
+    
+    def _paper_ltp(self, strike, direction):
+        """Simulated option LTP used in paper trading mode"""
+        return _MockBreeze.PAPER_LTP
+    
+    async def get_option_premium(self, strike, direction, contract=None):
         """
         Fetch live option price via Breeze API
         Called on-demand only (no background collection)
+        Pass `contract` (from get_trade_contract) to reuse precomputed call kwargs
         """
+        # Paper mode: the simulated quote is a constant, skip the API throttle/accounting layer
+        if self.paper_trading:
+            return self._paper_ltp(strike, direction)
+        
         try:
-            option_type = "call" if direction == "CALL" else "put"
-            expiry_date = self.get_next_expiry()
+            if contract is None:
+                contract = self.build_contract_kwargs(strike, direction)
             
             # Use API manager for safe call
             result = await self.api_manager.safe_api_call(
                 lambda: self.breeze.get_quotes(
                     stock_code="NIFTY",
                     exchange_code="NFO",
-                    expiry_date=expiry_date,
                     product_type="options",
-                    right=option_type,
-                    strike_price=str(strike)
+                    **contract
                 ),
-                call_type=f"get_quotes_{option_type}"
+                call_type=f"get_quotes_{contract['right']}"
             )
             
             if result and 'Success' in result and result['Success']:
                 ltp = float(result['Success'][0]['ltp'])
-                logger.debug(f"ðŸ’° {strike} {direction} @ â‚¹{ltp:.2f}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"ðŸ’° {strike} {direction} @ â‚¹{ltp:.2f}")
                 return ltp
             
             logger.warning(f"âš ï¸ Could not fetch price for {strike} {direction}")
@@ -244,8 +338,7 @@ class RealTrader:
         Returns order_id if successful
         """
         try:
-            option_type = "call" if direction == "CALL" else "put"
-            expiry_date = self.get_next_expiry()
+            contract = self.build_contract_kwargs(strike, direction)
             
             logger.info(f"ðŸ”¥ PLACING ORDER: {strike} {direction} @ â‚¹{entry_premium:.2f}")
             
@@ -258,14 +351,12 @@ class RealTrader:
                     action="buy",
                     order_type="market",
                     stoploss="",
-                    quantity=str(self.lot_size),
+                    quantity=self.quantity_str,
                     price="0",  # Market order
                     validity="day",
                     disclosed_quantity="0",
-                    expiry_date=expiry_date,
-                    right=option_type,
-                    strike_price=str(strike),
-                    user_remark="SuperPranni"
+                    user_remark="SuperPranni",
+                    **contract
                 ),
                 call_type="place_order"
             )
@@ -279,7 +370,7 @@ class RealTrader:
                 order_status = await self.verify_order_status(order_id)
                 
                 # Save to database
-                self.save_trade_to_db(
+                trade_id = await self.save_trade_to_db(
                     strike=strike,
                     direction=direction,
                     entry_premium=entry_premium,
@@ -288,6 +379,9 @@ class RealTrader:
                     order_id=order_id,
                     order_status=order_status
                 )
+                if trade_id is not None:
+                    self._trade_contracts[trade_id] = contract
+                self._open_trades_cache = None
                 
                 return order_id
             
@@ -320,21 +414,30 @@ class RealTrader:
             logger.error(f"âŒ Error verifying order: {e}")
             return "Error"
     
-    def save_trade_to_db(self, strike, direction, entry_premium, breakout_level, confluence_score, order_id, order_status):
-        """Save trade to real_trades database"""
+    def _write_trade_row(self, row):
+        """Insert a trade row (blocking - run via asyncio.to_thread)"""
+        conn = sqlite3.connect(DB_PAPER_TRADES)
         try:
-            conn = sqlite3.connect(DB_PAPER_TRADES)
             cursor = conn.cursor()
-            
             cursor.execute('''
                 INSERT INTO real_trades (
-                    timestamp, strike, direction, entry_premium, 
+                    timestamp, strike, direction, entry_premium,
                     breakout_level, confluence_score, quantity,
                     order_id, entry_order_status, status,
                     sl_candle_count, last_sl_check_time
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                datetime.now().isoformat(),
+            ''', row)
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+    
+    async def save_trade_to_db(self, strike, direction, entry_premium, breakout_level, confluence_score, order_id, order_status):
+        """Save trade to real_trades database"""
+        try:
+            now_iso = datetime.now().isoformat()
+            row = (
+                now_iso,
                 strike,
                 direction,
                 entry_premium,
@@ -345,12 +448,11 @@ class RealTrader:
                 order_status,
                 'OPEN',
                 0,
-                datetime.now().isoformat()
-            ))
+                now_iso
+            )
             
-            conn.commit()
-            trade_id = cursor.lastrowid
-            conn.close()
+            # SQLite commit blocks on fsync - keep it off the event loop
+            trade_id = await asyncio.to_thread(self._write_trade_row, row)
             
             logger.info(f"ðŸ’¾ Trade #{trade_id} saved to database")
             return trade_id
@@ -359,6 +461,34 @@ class RealTrader:
             logger.error(f"âŒ Error saving trade: {e}")
             return None
     
+    def get_trades_connection(self):
+        """Cached connection to paper_trades.db for the open-trade reads"""
+        if self._conn_trades is None:
+            self._conn_trades = sqlite3.connect(DB_PAPER_TRADES)
+        return self._conn_trades
+    
+    def get_trades_version(self):
+        """PRAGMA data_version - changes whenever another connection commits to paper_trades.db"""
+        return self.get_trades_connection().execute('PRAGMA data_version').fetchone()[0]
+    
+    def load_open_trades(self):
+        """Get all open trades from the database"""
+        return self.get_trades_connection().execute('''
+            SELECT id, strike, direction, entry_premium, quantity, 
+                   breakout_level, order_id, sl_candle_count, last_sl_check_time
+            FROM real_trades 
+            WHERE status = 'OPEN'
+            ORDER BY timestamp DESC
+        ''').fetchall()
+    
+    def get_open_trades(self):
+        """Open trades, re-read only when the cache was reset or the database changed"""
+        version = self.get_trades_version()
+        if self._open_trades_cache is None or version != self._open_trades_version:
+            self._open_trades_cache = self.load_open_trades()
+            self._open_trades_version = version
+        return self._open_trades_cache
+    
     async def monitor_open_trades(self):
         """
         Monitor open trades for:
@@ -366,28 +496,28 @@ class RealTrader:
         2. Level-based stop-loss (2 consecutive 5-min candles)
         """
         try:
-            conn = sqlite3.connect(DB_PAPER_TRADES)
-            cursor = conn.cursor()
-            
-            # Get all open trades
-            open_trades = cursor.execute('''
-                SELECT id, strike, direction, entry_premium, quantity, 
-                       breakout_level, order_id, sl_candle_count, last_sl_check_time
-                FROM real_trades 
-                WHERE status = 'OPEN'
-                ORDER BY timestamp DESC
-            ''').fetchall()
+            # Only re-read the table when an order was placed/exited or another
+            # process wrote paper_trades.db since the last read
+            open_trades = self.get_open_trades()
             
             if not open_trades:
                 return
             
             logger.info(f"ðŸ“Š Monitoring {len(open_trades)} open trade(s)")
             
+            # A new 5-min candle lands every 5 minutes; skip SL work until one does
+            try:
+                latest_candle = self.get_latest_5min_candle_time()
+            except Exception as e:
+                logger.error(f"âŒ Error reading latest 5-min candle: {e}")
+                latest_candle = None
+            candles = None
+            
             for trade in open_trades:
                 trade_id, strike, direction, entry_premium, quantity, breakout_level, order_id, sl_candle_count, last_sl_check = trade
                 
                 # Fetch current premium
-                current_premium = await self.get_option_premium(strike, direction)
+                current_premium = await self.get_option_premium(strike, direction, self.get_trade_contract(trade_id, strike, direction))
                 
                 if current_premium is None:
                     logger.warning(f"âš ï¸ Trade #{trade_id}: Could not fetch current price")
@@ -405,33 +535,58 @@ class RealTrader:
                     await self.exit_trade(trade_id, strike, direction, current_premium, "TARGET", order_id)
                     continue
                 
-                # Check STOP-LOSS (level-based)
-                await self.check_level_based_stoploss(trade_id, strike, direction, entry_premium, current_premium, breakout_level, sl_candle_count, last_sl_check, order_id)
-            
-            conn.close()
+                # Check STOP-LOSS (level-based) - only once per new 5-min candle per trade
+                if latest_candle is not None and self._sl_checked_candle.get(trade_id) == latest_candle:
+                    continue
+                
+                if candles is None:
+                    # Candles don't depend on the trade - fetch once for the whole pass
+                    try:
+                        candles = self.get_last_5min_candles()
+                    except Exception as e:
+                        logger.error(f"âŒ Error fetching 5-min candles for SL check: {e}")
+                        candles = []
+                
+                self._sl_checked_candle[trade_id] = latest_candle
+                await self.check_level_based_stoploss(trade_id, strike, direction, entry_premium, current_premium, breakout_level, sl_candle_count, last_sl_check, order_id, candles)
             
         except Exception as e:
             logger.error(f"âŒ Error monitoring trades: {e}")
     
-    async def check_level_based_stoploss(self, trade_id, strike, direction, entry_premium, current_premium, breakout_level, sl_candle_count, last_sl_check, order_id):
+    def get_5min_connection(self):
+        """Cached read-only connection to the 5-min candle DB (this bot never writes it)"""
+        if self._conn_5min_ro is None:
+            conn = sqlite3.connect(Path(DB_NIFTY_5MIN).as_uri() + '?mode=ro', uri=True)
+            conn.execute('PRAGMA mmap_size=268435456')  # 256 MB
+            conn.execute('PRAGMA query_only=1')
+            self._conn_5min_ro = conn
+        return self._conn_5min_ro
+    
+    def get_latest_5min_candle_time(self):
+        """MAX(datetime) of data_5min - changes only when a new candle is written"""
+        return self.get_5min_connection().execute('SELECT MAX(datetime) FROM data_5min').fetchone()[0]
+    
+    def get_last_5min_candles(self):
+        """Get last 2 completed 5-min candles as (close, datetime) rows, most recent first"""
+        return self.get_5min_connection().execute('''
+            SELECT close, datetime 
+            FROM data_5min 
+            WHERE TIME(datetime) >= '09:15:00'
+            AND TIME(datetime) <= '15:30:00'
+            ORDER BY datetime DESC 
+            LIMIT 2
+        ''').fetchall()
+    
+    async def check_level_based_stoploss(self, trade_id, strike, direction, entry_premium, current_premium, breakout_level, sl_candle_count, last_sl_check, order_id, candles):
         """
         Check level-based stop-loss:
         - For CALL: Exit if 2 consecutive 5-min candles close BELOW breakout level
         - For PUT: Exit if 2 consecutive 5-min candles close ABOVE breakout level
+        
+        `candles` comes from get_last_5min_candles(), fetched once per monitor pass
+        and only when a new candle has arrived since this trade was last checked
         """
         try:
-            # Get last 2 completed 5-min candles
-            conn = sqlite3.connect(DB_NIFTY_5MIN)
-            candles = conn.execute('''
-                SELECT close, datetime 
-                FROM data_5min 
-                WHERE TIME(datetime) >= '09:15:00'
-                AND TIME(datetime) <= '15:30:00'
-                ORDER BY datetime DESC 
-                LIMIT 2
-            ''').fetchall()
-            conn.close()
-            
             if len(candles) < 2:
                 logger.debug(f"Trade #{trade_id}: Not enough candles for SL check")
                 return
@@ -439,24 +594,23 @@ class RealTrader:
             candle1_close, candle1_time = candles[0]  # Most recent
             candle2_close, candle2_time = candles[1]  # Previous
             
-            # Check if candles violate level
-            if direction == "CALL":
-                # For CALL: Exit if both candles close BELOW breakout level
-                violation = candle1_close < breakout_level and candle2_close < breakout_level
-                condition = f"close < {breakout_level}"
-            else:  # PUT
-                # For PUT: Exit if both candles close ABOVE breakout level
-                violation = candle1_close > breakout_level and candle2_close > breakout_level
-                condition = f"close > {breakout_level}"
+            # Check if candles violate level: CALL exits when both close BELOW the
+            # level, PUT when both close ABOVE it - a signed delta covers both cases
+            sign = 1 if direction == "CALL" else -1
+            violation = sign * (breakout_level - candle1_close) > 0 and sign * (breakout_level - candle2_close) > 0
             
             if violation:
-                logger.warning(f"ðŸ›‘ STOP-LOSS: Trade #{trade_id} - 2 consecutive candles violated {condition}")
-                logger.warning(f"   Candle 1: {candle1_time} @ â‚¹{candle1_close:.2f}")
-                logger.warning(f"   Candle 2: {candle2_time} @ â‚¹{candle2_close:.2f}")
+                condition = f"close {'<' if direction == 'CALL' else '>'} {breakout_level}"
+                logger.warning(
+                    f"ðŸ›‘ STOP-LOSS: Trade #{trade_id} - 2 consecutive candles violated {condition}\n"
+                    f"   Candle 1: {candle1_time} @ â‚¹{candle1_close:.2f}\n"
+                    f"   Candle 2: {candle2_time} @ â‚¹{candle2_close:.2f}"
+                )
                 
                 await self.exit_trade(trade_id, strike, direction, current_premium, "STOP_LOSS_LEVEL", order_id)
             else:
-                logger.debug(f"Trade #{trade_id}: SL check OK - {candle1_close:.2f}, {candle2_close:.2f} vs level {breakout_level:.2f}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Trade #{trade_id}: SL check OK - {candle1_close:.2f}, {candle2_close:.2f} vs level {breakout_level:.2f}")
             
         except Exception as e:
             logger.error(f"âŒ Error checking stop-loss: {e}")
@@ -466,8 +620,7 @@ class RealTrader:
         Exit trade via breeze.square_off()
         """
         try:
-            option_type = "call" if direction == "CALL" else "put"
-            expiry_date = self.get_next_expiry()
+            contract = self.get_trade_contract(trade_id, strike, direction)
             
             logger.info(f"ðŸšª EXITING Trade #{trade_id}: {strike} {direction} @ â‚¹{exit_premium:.2f} ({exit_reason})")
             
@@ -477,15 +630,13 @@ class RealTrader:
                     exchange_code="NFO",
                     product="options",
                     stock_code="NIFTY",
-                    expiry_date=expiry_date,
-                    right=option_type,
-                    strike_price=str(strike),
                     action="sell",
                     order_type="market",
                     validity="day",
                     stoploss="0",
-                    quantity=str(self.lot_size),
-                    price="0"
+                    quantity=self.quantity_str,
+                    price="0",
+                    **contract
                 ),
                 call_type="square_off"
             )
@@ -501,35 +652,49 @@ class RealTrader:
                 await asyncio.sleep(2)
                 exit_order_status = await self.verify_order_status(exit_order_id)
             
-            # Update database
-            conn = sqlite3.connect(DB_PAPER_TRADES)
+            # Update database (off the event loop)
+            pnl = await asyncio.to_thread(
+                self._close_trade_row, trade_id, exit_premium, exit_reason, exit_order_id, exit_order_status
+            )
+            self._trade_contracts.pop(trade_id, None)
+            self._sl_checked_candle.pop(trade_id, None)
+            self._open_trades_cache = None
+            if pnl is not None:
+                logger.info(f"âœ… Trade #{trade_id} CLOSED: P&L â‚¹{pnl:.2f} ({exit_reason})")
+            
+        except Exception as e:
+            logger.error(f"âŒ Error exiting trade: {e}")
+    
+    def _close_trade_row(self, trade_id, exit_premium, exit_reason, exit_order_id, exit_order_status):
+        """Mark a trade CLOSED and return its P&L (blocking - run via asyncio.to_thread)"""
+        conn = sqlite3.connect(DB_PAPER_TRADES)
+        try:
             cursor = conn.cursor()
             
             # Get entry premium for P&L calculation
             entry_premium = cursor.execute('SELECT entry_premium, quantity FROM real_trades WHERE id = ?', (trade_id,)).fetchone()
-            if entry_premium:
-                entry_prem, qty = entry_premium
-                pnl = (exit_premium - entry_prem) * qty
-                
-                cursor.execute('''
-                    UPDATE real_trades 
-                    SET status = 'CLOSED',
-                        exit_premium = ?,
-                        exit_timestamp = ?,
-                        pnl = ?,
-                        exit_reason = ?,
-                        exit_order_id = ?,
-                        exit_order_status = ?
-                    WHERE id = ?
-                ''', (exit_premium, datetime.now().isoformat(), pnl, exit_reason, exit_order_id, exit_order_status, trade_id))
-                
-                conn.commit()
-                logger.info(f"âœ… Trade #{trade_id} CLOSED: P&L â‚¹{pnl:.2f} ({exit_reason})")
+            if not entry_premium:
+                return None
             
-            conn.close()
+            entry_prem, qty = entry_premium
+            pnl = (exit_premium - entry_prem) * qty
             
-        except Exception as e:
-            logger.error(f"âŒ Error exiting trade: {e}")
+            cursor.execute('''
+                UPDATE real_trades 
+                SET status = 'CLOSED',
+                    exit_premium = ?,
+                    exit_timestamp = ?,
+                    pnl = ?,
+                    exit_reason = ?,
+                    exit_order_id = ?,
+                    exit_order_status = ?
+                WHERE id = ?
+            ''', (exit_premium, datetime.now().isoformat(), pnl, exit_reason, exit_order_id, exit_order_status, trade_id))
+            
+            conn.commit()
+            return pnl
+        finally:
+            conn.close()
     
     def check_15min_breakout(self):
         """Check for breakout signals from Super Pranni Monitor"""
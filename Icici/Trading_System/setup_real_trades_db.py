@@ -9,6 +9,9 @@ def setup_real_trades_database():
     conn = sqlite3.connect('paper_trades.db')
     cursor = conn.cursor()
     
+    # WAL keeps the schema changes below to a single cheap commit
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     try:
         # Rename table
         print("📊 Renaming safe_trades to real_trades...")
@@ -32,16 +35,17 @@ def setup_real_trades_database():
     ]
     
     print("\n📊 Adding real trading columns...")
+    cursor.execute('BEGIN')
     for col_name, col_type in columns_to_add:
         try:
             cursor.execute(f'ALTER TABLE real_trades ADD COLUMN {col_name} {col_type}')
-            conn.commit()
             print(f"✅ Added column: {col_name}")
         except sqlite3.OperationalError as e:
             if "duplicate column name" in str(e):
                 print(f"ℹ️ Column {col_name} already exists")
             else:
                 print(f"⚠️ Error adding {col_name}: {e}")
+    conn.commit()
     
     # Show final schema
     print("\n📊 Final Schema for real_trades:")
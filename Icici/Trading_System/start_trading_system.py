@@ -7,15 +7,26 @@ Unified Trading System Launcher
 """
 
 import asyncio
-import subprocess
+import time
 import sys
 import os
 import logging
+import sqlite3
+import queue
+from pathlib import Path
+from dataclasses import dataclass
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from typing import Callable, Tuple
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import signal
 
-# Setup logging
+# Setup logging - asctime already timestamps every record, and we never use
+# the process/thread/multiprocessing fields, so skip collecting them
+logging.logProcesses = False
+logging.logThreads = False
+logging.logMultiprocessing = False
+logging.raiseExceptions = False
+
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -23,93 +34,263 @@ logger.setLevel(logging.INFO)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(log_formatter)
 console_handler.stream.reconfigure(encoding='utf-8')
-logger.addHandler(console_handler)
 
 file_handler = RotatingFileHandler('trading_system.log', maxBytes=10*1024*1024, backupCount=5, encoding='utf-8')
 file_handler.setFormatter(log_formatter)
-logger.addHandler(file_handler)
+
+# Console/file I/O (and log rotation) runs on the listener thread, not the monitor loop;
+# stopped at the end of TradingSystemLauncher.shutdown() to flush what's queued
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+log_listener.start()
 
 logger.propagate = False
 
 
+def use_pidfd_child_watcher(loop):
+    """
+    Have the event loop learn about child exits from a pidfd (Linux 5.3+)
+    instead of asyncio's default of one blocking waitpid() thread per child.
+    Python 3.12+ already does this by default; Windows uses IOCP handles.
+    """
+    if sys.version_info >= (3, 12) or not hasattr(os, 'pidfd_open') or not hasattr(asyncio, 'PidfdChildWatcher'):
+        return False
+    
+    try:
+        os.close(os.pidfd_open(os.getpid()))  # kernel support check
+    except OSError:
+        return False
+    
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(loop)
+    asyncio.set_child_watcher(watcher)
+    return True
+
+
+# Own session/process group per child (isolated from terminal Ctrl+C, whole group
+# can be signalled) and no inherited FDs. No preexec_fn, so CPython keeps its
+# vfork/posix_spawn fast path instead of a full fork of this process.
+CHILD_SPAWN_KWARGS = {'start_new_session': True, 'close_fds': True, 'pass_fds': ()}
+
+
+# Staged shutdown: SIGTERM, then SIGINT after SHUTDOWN_GRACE s, then SIGKILL after
+# another SHUTDOWN_GRACE/2 s - long enough for WAL checkpoints and order cancels
+SHUTDOWN_GRACE = int(os.getenv('SHUTDOWN_GRACE', '30'))
+SIGKILL = getattr(signal, 'SIGKILL', None)  # None on Windows
+
+
+def signal_process_group(process, sig):
+    """Send `sig` to the child's whole process group; on Windows SIGKILL -> kill(), anything else -> terminate()"""
+    if hasattr(os, 'killpg'):
+        # start_new_session makes the child its group leader, so pgid == pid
+        os.killpg(process.pid, sig)
+    elif sig == SIGKILL:
+        process.kill()
+    else:
+        process.terminate()
+
+
+# Startup readiness probes (replace the old fixed 5 s + 3 s sleeps)
+STARTUP_TIMEOUT_SECONDS = 10
+
+
+def data_collector_ready(spawned_at):
+    """The collector has created the 5-min candle table the trader reads"""
+    try:
+        conn = sqlite3.connect(Path('NIFTY_5min_data.db').resolve().as_uri() + '?mode=ro', uri=True)
+        try:
+            conn.execute('SELECT 1 FROM data_5min LIMIT 1')
+            return True
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+def trader_ready(spawned_at):
+    """The trader has written its startup lines to real_trader.log"""
+    try:
+        return os.path.getmtime('real_trader.log') >= spawned_at
+    except OSError:
+        return False
+
+
+# Liveness: during market hours a child whose heartbeat files stop changing is
+# restarted, catching hangs (stuck socket read, DB lock) that never exit
+LIVENESS_CHECK_SECONDS = 60
+STALL_SECONDS = 600  # two missed 5-min candles
+
+
+def is_market_open(now=None):
+    """Weekday between 9:15 and 15:30 (exchange holidays not accounted for)"""
+    now = now or datetime.now()
+    return now.weekday() < 5 and (9, 15) <= (now.hour, now.minute) < (15, 30)
+
+
+def last_write_time(paths):
+    """Latest mtime among `paths`, 0 if none of them exist"""
+    latest = 0
+    for path in paths:
+        try:
+            latest = max(latest, os.path.getmtime(path))
+        except OSError:
+            pass
+    return latest
+
+
+@dataclass
+class ChildSpec:
+    """One supervised child process"""
+    name: str                       # display name used in log lines
+    script: str                     # run with the launcher's Python
+    banner: str                     # header logged when starting it
+    console_log: str                # receives the child's stdout/stderr
+    is_ready: Callable[[float], bool]  # startup probe, called with the spawn wall-clock time
+    details: Tuple[str, ...] = ()   # extra lines logged after a successful start
+    heartbeat_files: Tuple[str, ...] = ()  # written regularly while healthy (liveness check)
+
+
+# Start order (the trader reads the collector's databases)
+CHILDREN = [
+    ChildSpec(
+        name="Data Collector",
+        script='websocket_data_collector.py',
+        banner="📊 STARTING WEBSOCKET DATA COLLECTOR",
+        console_log='websocket_data_collector_console.log',
+        is_ready=data_collector_ready,
+        details=(
+            "   - Populates: NIFTY_5min_data.db",
+            "   - Populates: NIFTY_15min_data.db",
+            "   - Check logs: websocket_data_collector.log (console: websocket_data_collector_console.log)",
+        ),
+        heartbeat_files=('NIFTY_5min_data.db', 'NIFTY_5min_data.db-wal'),
+    ),
+    ChildSpec(
+        name="Real Trader",
+        script='real_trader.py',
+        banner="🤖 STARTING REAL TRADER BOT",
+        console_log='real_trader_console.log',
+        is_ready=trader_ready,
+        details=(
+            "   - Reads Super Pranni signals from databases",
+            "   - Executes trades via Breeze API",
+            "   - Monitors positions with ₹10 target & level-based SL",
+            "   - Check logs: real_trader.log (console: real_trader_console.log)",
+        ),
+    ),
+]
+
+
 class TradingSystemLauncher:
     """Manages both websocket collector and trading bot"""
     
-    def __init__(self):
-        self.data_collector_process = None
-        self.trader_process = None
+    # Crash-restart backoff
+    QUICK_CRASH_SECONDS = 10      # non-zero exit within this uptime counts as a failed start
+    STABLE_SECONDS = 60           # surviving this long resets the failure count
+    MAX_RESTART_DELAY = 60        # backoff cap: min(60, 2 ** fails) seconds
+    MAX_FAILS = 5                 # circuit breaker: more than this many failed starts...
+    FAIL_WINDOW_SECONDS = 300     # ...within 5 minutes shuts the system down
+    
+    def __init__(self, children=CHILDREN):
+        self.children = list(children)
+        self.procs = {}       # name -> asyncio.subprocess.Process
         self.running = True
         
+        # Child stdout/stderr go straight to these files (no pipes for us to drain)
+        self.outputs = {}     # name -> open console log file
+        
+        # Per-child restart bookkeeping for the backoff/circuit breaker
+        self._restart_state = {
+            spec.name: {'fails': 0, 'first_fail': None, 'started_at': None, 'spawned_at': None}
+            for spec in self.children
+        }
+        
+        # Set (from signal handlers) to wake the monitor loop for shutdown
+        self._loop = None
+        self._stop_event = None
+        
         # Get Python executable path
         self.python_exe = sys.executable
         
         logger.info("=" * 80)
         logger.info("🚀 UNIFIED TRADING SYSTEM LAUNCHER")
         logger.info("=" * 80)
-        logger.info(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info(f"🐍 Python: {self.python_exe}")
         logger.info("=" * 80)
     
-    def start_data_collector(self):
-        """Start the websocket data collector process"""
+    def _close_output(self, spec):
+        """Close a child's console log file handle, if open"""
+        output_file = self.outputs.pop(spec.name, None)
+        if output_file and not output_file.closed:
+            output_file.close()
+    
+    async def _spawn(self, spec):
+        """Start a child process"""
         try:
             logger.info("\n" + "=" * 80)
-            logger.info("📊 STARTING WEBSOCKET DATA COLLECTOR")
+            logger.info(spec.banner)
             logger.info("=" * 80)
             
-            # Start data collector as subprocess
-            self.data_collector_process = subprocess.Popen(
-                [self.python_exe, 'websocket_data_collector.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                encoding='utf-8',
-                errors='replace'
+            self._close_output(spec)
+            self.outputs[spec.name] = open(spec.console_log, 'ab', buffering=0)
+            
+            state = self._restart_state[spec.name]
+            state['spawned_at'] = time.time()
+            self.procs[spec.name] = await asyncio.create_subprocess_exec(
+                self.python_exe, spec.script,
+                stdout=self.outputs[spec.name],
+                stderr=asyncio.subprocess.STDOUT,
+                **CHILD_SPAWN_KWARGS
             )
+            state['started_at'] = time.monotonic()
             
-            logger.info(f"✅ Data Collector started (PID: {self.data_collector_process.pid})")
-            logger.info("   - Populates: NIFTY_5min_data.db")
-            logger.info("   - Populates: NIFTY_15min_data.db")
-            logger.info("   - Check logs: websocket_data_collector.log")
+            logger.info(f"✅ {spec.name} started (PID: {self.procs[spec.name].pid})")
+            for line in spec.details:
+                logger.info(line)
             
             return True
             
         except Exception as e:
-            logger.error(f"❌ Failed to start data collector: {e}")
+            logger.error(f"❌ Failed to start {spec.name}: {e}")
             return False
     
-    def start_trader(self):
-        """Start the real trader bot process"""
-        try:
-            logger.info("\n" + "=" * 80)
-            logger.info("🤖 STARTING REAL TRADER BOT")
-            logger.info("=" * 80)
-            
-            # Start trader as subprocess
-            self.trader_process = subprocess.Popen(
-                [self.python_exe, 'real_trader.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            logger.info(f"✅ Real Trader started (PID: {self.trader_process.pid})")
-            logger.info("   - Reads Super Pranni signals from databases")
-            logger.info("   - Executes trades via Breeze API")
-            logger.info("   - Monitors positions with ₹10 target & level-based SL")
-            logger.info("   - Check logs: real_trader.log")
-            
-            return True
+    def _get_restart_delay(self, name, returncode):
+        """
+        Backoff (seconds) before relaunching a child that just exited,
+        or None when it keeps failing at startup and we should give up
+        """
+        state = self._restart_state[name]
+        now = time.monotonic()
+        uptime = now - state['started_at'] if state['started_at'] is not None else 0
+        
+        if uptime > self.STABLE_SECONDS:
+            state['fails'] = 0
+            state['first_fail'] = None
+        
+        if returncode != 0 and uptime < self.QUICK_CRASH_SECONDS:
+            if state['first_fail'] is None or now - state['first_fail'] > self.FAIL_WINDOW_SECONDS:
+                state['first_fail'] = now
+                state['fails'] = 0
+            state['fails'] += 1
             
-        except Exception as e:
-            logger.error(f"❌ Failed to start trader: {e}")
-            return False
+            if state['fails'] > self.MAX_FAILS:
+                return None
+        
+        return min(self.MAX_RESTART_DELAY, 2 ** state['fails']) if state['fails'] else 0
     
-    def monitor_processes(self):
+    async def _relaunch_and_wait(self, spec, delay):
+        """Relaunch a child after `delay` seconds, then wait for it to exit"""
+        if delay:
+            await asyncio.sleep(delay)
+        
+        logger.info(f"🔄 Restarting {spec.name}...")
+        if not await self._spawn(spec):
+            # Spawn itself failed - the dead process is still current, retry shortly
+            await asyncio.sleep(5)
+        return await self.procs[spec.name].wait()
+    
+    async def monitor_processes(self):
         """Monitor both processes and restart if needed"""
         logger.info("\n" + "=" * 80)
         logger.info("👁️  MONITORING BOTH PROCESSES")
@@ -117,33 +298,129 @@ class TradingSystemLauncher:
         logger.info("Press Ctrl+C to stop both processes gracefully")
         logger.info("=" * 80)
         
+        # Each waiter task completes the moment its child exits - no periodic polling
+        waiters = {
+            asyncio.create_task(self.procs[spec.name].wait()): spec
+            for spec in self.children if spec.name in self.procs
+        }
+        stop_waiter = asyncio.create_task(self._stop_event.wait())
+        
         try:
-            while self.running:
-                # Check data collector
-                if self.data_collector_process:
-                    dc_status = self.data_collector_process.poll()
-                    if dc_status is not None:
-                        logger.error(f"⚠️ Data Collector stopped unexpectedly (exit code: {dc_status})")
-                        logger.info("🔄 Restarting Data Collector...")
-                        self.start_data_collector()
+            while self.running and waiters:
+                done, _ = await asyncio.wait({stop_waiter, *waiters}, timeout=LIVENESS_CHECK_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
                 
-                # Check trader
-                if self.trader_process:
-                    trader_status = self.trader_process.poll()
-                    if trader_status is not None:
-                        logger.error(f"⚠️ Real Trader stopped unexpectedly (exit code: {trader_status})")
-                        logger.info("🔄 Restarting Real Trader...")
-                        self.start_trader()
+                if not done:
+                    self._check_liveness()
+                    continue
                 
-                # Sleep for 5 seconds before next check
-                import time
-                time.sleep(5)
-                
-        except KeyboardInterrupt:
-            logger.info("\n\n🛑 Keyboard interrupt received - shutting down gracefully...")
-            self.shutdown()
+                for task in done:
+                    if task is stop_waiter or not self.running:
+                        continue
+                    
+                    spec = waiters.pop(task)
+                    returncode = task.result()
+                    logger.error(f"⚠️ {spec.name} stopped unexpectedly (exit code: {returncode})")
+                    
+                    delay = self._get_restart_delay(spec.name, returncode)
+                    if delay is None:
+                        logger.critical(f"💀 {spec.name} failed to start {self._restart_state[spec.name]['fails']} times within "
+                                        f"{self.FAIL_WINDOW_SECONDS // 60} minutes - shutting down")
+                        self.request_stop()
+                        break
+                    
+                    if delay:
+                        logger.info(f"⏳ {spec.name} crashed on startup (failure #{self._restart_state[spec.name]['fails']}) - restarting in {delay}s")
+                    
+                    # Backoff sleep runs inside the waiter, so the other child is still watched
+                    waiters[asyncio.create_task(self._relaunch_and_wait(spec, delay))] = spec
+        finally:
+            stop_waiter.cancel()
+            for task in waiters:
+                task.cancel()
+    
+    def _check_liveness(self):
+        """SIGTERM children that have gone quiet during market hours; the monitor loop then restarts them"""
+        now = datetime.now()
+        if not is_market_open(now):
+            return
+        
+        # Don't count time before today's open or before the child's (re)start
+        session_start = now.replace(hour=9, minute=15, second=0, microsecond=0).timestamp()
+        for spec in self.children:
+            process = self.procs.get(spec.name)
+            if not spec.heartbeat_files or not process or process.returncode is not None:
+                continue
+            
+            since = max(last_write_time(spec.heartbeat_files), self._restart_state[spec.name]['spawned_at'], session_start)
+            idle = now.timestamp() - since
+            if idle > STALL_SECONDS:
+                logger.warning(f"⚠️ {spec.name} hasn't written {spec.heartbeat_files[0]} for {idle / 60:.0f} min - restarting it")
+                try:
+                    signal_process_group(process, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+    
+    def request_stop(self):
+        """Ask the monitor loop to stop (safe to call from a signal handler)"""
+        self.running = False
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
     
-    def shutdown(self):
+    def forward_signal(self, sig):
+        """
+        Pass a signal the launcher received on to every running child. They run in
+        their own sessions, so a terminal Ctrl+C or hangup doesn't reach them otherwise
+        """
+        for process in self.procs.values():
+            if process.returncode is None:
+                try:
+                    signal_process_group(process, sig)
+                except ProcessLookupError:
+                    pass
+    
+    async def _stop(self, spec, grace=SHUTDOWN_GRACE):
+        """Stop a child: SIGTERM, SIGINT after `grace` seconds, SIGKILL after another `grace // 2`"""
+        process = self.procs.get(spec.name)
+        if not process or process.returncode is not None:
+            return
+        
+        logger.info(f"⏹️  Stopping {spec.name}...")
+        for sig, timeout in ((signal.SIGTERM, grace), (signal.SIGINT, grace // 2), (SIGKILL, None)):
+            try:
+                signal_process_group(process, sig)
+                await asyncio.wait_for(process.wait(), timeout=timeout)
+                break
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ {spec.name} still running after {timeout}s, escalating...")
+            except ProcessLookupError:
+                # Exited between the returncode check (or the previous stage) and this signal
+                await process.wait()
+                break
+        
+        logger.info(f"✅ {spec.name} stopped (exit code: {process.returncode})")
+    
+    async def _wait_until_ready(self, spec, timeout=STARTUP_TIMEOUT_SECONDS):
+        """Poll the child's readiness probe every 100 ms until it passes, the child exits, or `timeout` elapses"""
+        process = self.procs[spec.name]
+        spawned_at = self._restart_state[spec.name]['spawned_at']
+        
+        async def poll():
+            while not spec.is_ready(spawned_at):
+                if process.returncode is not None:
+                    return False
+                await asyncio.sleep(0.1)
+            return True
+        
+        try:
+            if await asyncio.wait_for(poll(), timeout=timeout):
+                logger.info(f"✅ {spec.name} ready")
+            else:
+                logger.warning(f"⚠️ {spec.name} exited during startup")
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {spec.name} not ready after {timeout}s - continuing anyway")
+    
+    async def shutdown(self):
         """Gracefully shutdown both processes"""
         logger.info("\n" + "=" * 80)
         logger.info("🛑 SHUTTING DOWN TRADING SYSTEM")
@@ -151,58 +428,34 @@ class TradingSystemLauncher:
         
         self.running = False
         
-        # Stop trader first
-        if self.trader_process and self.trader_process.poll() is None:
-            logger.info("⏹️  Stopping Real Trader...")
-            try:
-                self.trader_process.terminate()
-                self.trader_process.wait(timeout=10)
-                logger.info("✅ Real Trader stopped")
-            except subprocess.TimeoutExpired:
-                logger.warning("⚠️ Real Trader didn't stop gracefully, forcing...")
-                self.trader_process.kill()
-                logger.info("✅ Real Trader killed")
-        
-        # Stop data collector
-        if self.data_collector_process and self.data_collector_process.poll() is None:
-            logger.info("⏹️  Stopping Data Collector...")
-            try:
-                self.data_collector_process.terminate()
-                self.data_collector_process.wait(timeout=10)
-                logger.info("✅ Data Collector stopped")
-            except subprocess.TimeoutExpired:
-                logger.warning("⚠️ Data Collector didn't stop gracefully, forcing...")
-                self.data_collector_process.kill()
-                logger.info("✅ Data Collector killed")
+        # Both shutdown ladders run at once, so the worst case is one ladder, not two
+        await asyncio.gather(*(self._stop(spec) for spec in reversed(self.children)))
+        for spec in self.children:
+            self._close_output(spec)
         
         logger.info("\n" + "=" * 80)
         logger.info("✅ TRADING SYSTEM SHUTDOWN COMPLETE")
         logger.info("=" * 80)
-        logger.info(f"📅 Stopped at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        logger.info("=" * 80)
+        
+        log_listener.stop()
     
-    def run(self):
+    async def run(self):
         """Main run method"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        
+        if use_pidfd_child_watcher(self._loop):
+            logger.info("👁️  Child exits delivered via pidfd (no watcher threads)")
+        
         try:
-            # Start data collector first (trader needs the databases)
-            if not self.start_data_collector():
-                logger.error("❌ Cannot start without data collector!")
-                return
-            
-            # Wait 5 seconds for data collector to initialize
-            logger.info("\n⏳ Waiting 5 seconds for data collector to initialize...")
-            import time
-            time.sleep(5)
-            
-            # Start trader
-            if not self.start_trader():
-                logger.error("❌ Cannot start trader!")
-                self.shutdown()
-                return
-            
-            # Wait 3 seconds for trader to initialize
-            logger.info("\n⏳ Waiting 3 seconds for trader to initialize...")
-            time.sleep(3)
+            # Start in order, each one ready before the next (the trader needs the collector's databases)
+            for spec in self.children:
+                if not await self._spawn(spec):
+                    logger.error(f"❌ Cannot start {spec.name}!")
+                    return
+                
+                logger.info(f"\n⏳ Waiting for {spec.name} to initialize...")
+                await self._wait_until_ready(spec)
             
             logger.info("\n" + "=" * 80)
             logger.info("✅ BOTH SYSTEMS RUNNING!")
@@ -212,14 +465,13 @@ class TradingSystemLauncher:
             logger.info("=" * 80)
             
             # Monitor both processes
-            self.monitor_processes()
+            await self.monitor_processes()
             
         except Exception as e:
             logger.error(f"❌ Critical error: {e}")
-            self.shutdown()
         
         finally:
-            self.shutdown()
+            await self.shutdown()
 
 
 def main():
@@ -229,14 +481,17 @@ def main():
     
     def signal_handler(sig, frame):
         logger.info("\n\n🛑 Shutdown signal received...")
-        launcher.shutdown()
-        sys.exit(0)
+        launcher.forward_signal(sig)
+        launcher.request_stop()
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, 'SIGHUP'):
+        # Terminal hangup / nohup / systemd reload
+        signal.signal(signal.SIGHUP, signal_handler)
     
     # Run the system
-    launcher.run()
+    asyncio.run(launcher.run())
 
 
 if __name__ == "__main__":
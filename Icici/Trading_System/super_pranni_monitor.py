@@ -4,12 +4,13 @@ FIXED Enhanced Pranni Monitor - Always Detects Breakouts!
 """
 
 import sqlite3
-import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 import time
-import json
 import os
+import threading
 
 # Get absolute path to database
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,6 +18,173 @@ DB_PATH_15MIN = os.path.join(BASE_DIR, 'NIFTY_15min_data.db')
 DB_PATH_5MIN = os.path.join(BASE_DIR, 'NIFTY_5min_data.db')
 DB_PATH_1DAY = os.path.join(BASE_DIR, 'NIFTY_1day_data.db')
 
+# Queries live at module level with ? placeholders so each one is the same string on
+# every call and sqlite3's per-connection statement cache reuses the compiled statement.
+# Day filters are [day, next day) ranges on the datetime text instead of LIKE 'day%'.
+TODAY_5MIN_SQL = """
+SELECT datetime, open, high, low, close, 0 as volume
+FROM data_5min 
+WHERE datetime >= ? AND datetime < ?
+ORDER BY datetime
+"""
+
+UPSERT_15MIN_SQL = """
+INSERT OR REPLACE INTO data_15min (datetime, open, high, low, close, volume)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Completed daily candles after the last one folded into the ATR (true daily OHLC,
+# so no per-day GROUP BY / correlated subquery over 15-min rows)
+ATR_DAYS_SQL = """
+SELECT datetime, high, low, close
+FROM data_1day 
+WHERE datetime > ? AND datetime < ?
+ORDER BY datetime
+"""
+ATR_PERIOD = 14
+
+PREV_DAY_SQL = """
+SELECT MIN(low) as low, MAX(high) as high, 
+       (SELECT open FROM data_15min WHERE datetime >= ? AND datetime < ? ORDER BY datetime LIMIT 1) as prev_open,
+       (SELECT close FROM data_15min WHERE datetime >= ? AND datetime < ? ORDER BY datetime DESC LIMIT 1) as prev_close
+FROM data_15min 
+WHERE datetime >= ? AND datetime < ?
+"""
+
+# Weekly/monthly lookbacks in one pass: each daily row lands in the shortest
+# lookback (7/14/30 days) that contains it; the longer levels combine buckets
+DAILY_RANGES_SQL = """
+SELECT CASE WHEN datetime >= ? THEN 'wk1' WHEN datetime >= ? THEN 'wk2' ELSE 'mo1' END as lookback,
+       MIN(low) as low, MAX(high) as high
+FROM data_1day 
+WHERE datetime >= ? AND datetime < ?
+GROUP BY lookback
+"""
+
+CURRENT_PRICE_SQL = """
+SELECT close, datetime 
+FROM data_15min 
+ORDER BY datetime DESC 
+LIMIT 1
+"""
+
+# Latest 15-min candle plus the one before it (to tell FRESH breakouts from continuations)
+LAST_2_CANDLES_SQL = """
+SELECT datetime, open, high, low, close 
+FROM data_15min 
+ORDER BY datetime DESC 
+LIMIT 2
+"""
+
+# Backtest: Opening Range FRESH breakouts/breakdowns for every day in one pass, on a
+# connection to the 15-min DB with the 5-min DB attached as m5. LAG gives each 15-min
+# candle the previous candle's close (across day boundaries, as the live LIMIT 2 does);
+# the 9:15 candle gets the same PDH/PDL gap filter as check_all_breakouts
+BACKTEST_SQL = """
+WITH candles AS (
+    SELECT datetime, open, close, LAG(close) OVER (ORDER BY datetime) AS prev_close
+    FROM data_15min
+    WHERE datetime < ?
+),
+opening AS (
+    SELECT day, MAX(high) AS or_high, MIN(low) AS or_low
+    FROM (
+        SELECT substr(datetime, 1, 10) AS day, high, low,
+               ROW_NUMBER() OVER (PARTITION BY substr(datetime, 1, 10) ORDER BY datetime) AS n
+        FROM m5.data_5min
+        WHERE datetime >= ? AND datetime < ?
+    )
+    WHERE n <= 3
+    GROUP BY day
+),
+prev_day AS (
+    SELECT substr(datetime, 1, 10) AS day, MAX(high) AS pdh, MIN(low) AS pdl
+    FROM data_15min
+    WHERE datetime >= ? AND datetime < ?
+    GROUP BY day
+)
+SELECT c.datetime, c.close, c.prev_close, o.or_high, o.or_low
+FROM candles c
+JOIN opening o ON o.day = substr(c.datetime, 1, 10)
+LEFT JOIN prev_day p ON p.day = date(c.datetime, '-1 day')
+WHERE c.datetime >= ?
+  AND ((c.prev_close <= o.or_high AND c.close > o.or_high) OR (c.prev_close >= o.or_low AND c.close < o.or_low))
+  AND CASE
+      WHEN substr(c.datetime, 12, 5) != '09:15' OR p.pdh IS NULL THEN 1
+      WHEN c.open - p.pdh > 50 AND c.close BETWEEN p.pdh - 20 AND p.pdh + 20 THEN 1
+      WHEN p.pdl - c.open > 50 AND c.close BETWEEN p.pdl - 20 AND p.pdl + 20 THEN 1
+      WHEN c.open - p.pdh > 50 OR p.pdl - c.open > 50 THEN 0
+      ELSE 1
+  END
+ORDER BY c.datetime
+"""
+
+
+def connect_db(path):
+    """
+    Open a monitor connection tuned for many small reads and few small writes:
+    WAL (readers don't block the collector's writes), mmap'd pages, 64 MB cache
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA busy_timeout=5000')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
+    conn.execute('PRAGMA cache_size=-65536')
+    return conn
+
+
+@dataclass(slots=True)
+class Level:
+    """A support/resistance level. Slotted: one is built per level on every poll.
+    
+    Still readable like the dicts it replaced (level['high'], 'open' in level,
+    level.get('type')) for the dashboard and check scripts; fields that are None
+    count as missing keys.
+    """
+    high: float
+    low: float
+    type: str
+    candles: int = None
+    open: float = None
+    close: float = None
+    # Per-poll fields, filled in by update_all_levels against the current price
+    high_distance: float = None
+    low_distance: float = None
+    high_dist_atr: float = None
+    low_dist_atr: float = None
+    high_probability: int = None
+    low_probability: int = None
+    high_broken: bool = None
+    low_broken: bool = None
+    
+    def __post_init__(self):
+        # Plain floats whatever the column held, so the per-poll distance maths
+        # never mixes ints or numpy scalars into the arithmetic
+        self.high = float(self.high)
+        self.low = float(self.low)
+    
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+    
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __contains__(self, key):
+        return self.get(key) is not None
+    
+    def keys(self):
+        return [key for key in self.__slots__ if getattr(self, key) is not None]
+    
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+
 class FixedPranniMonitor:
     def __init__(self):
         if not os.path.exists(DB_PATH_15MIN):
@@ -26,14 +194,30 @@ class FixedPranniMonitor:
         if not os.path.exists(DB_PATH_1DAY):
             raise FileNotFoundError(f"1-day Database not found: {DB_PATH_1DAY}")
             
-        self.conn_15min = sqlite3.connect(DB_PATH_15MIN, check_same_thread=False)
-        self.conn_5min = sqlite3.connect(DB_PATH_5MIN, check_same_thread=False)
-        self.conn_1day = sqlite3.connect(DB_PATH_1DAY, check_same_thread=False)
-        
-        self.processed_candles = set()  # Track processed candles to avoid duplicates
+        self.conn_15min = connect_db(DB_PATH_15MIN)
+        self.conn_5min = connect_db(DB_PATH_5MIN)
+        self.conn_1day = connect_db(DB_PATH_1DAY)
+        
+        # Every query filters or sorts on datetime. The collector's tables have it as the
+        # PRIMARY KEY, which is indexed already; tables created another way, e.g. by
+        # pandas to_sql, get idx_datetime (same name the collector uses for those)
+        for conn, table in ((self.conn_5min, 'data_5min'), (self.conn_15min, 'data_15min'), (self.conn_1day, 'data_1day')):
+            pk = any(column[1] == 'datetime' and column[5] for column in conn.execute(f'PRAGMA table_info({table})'))
+            if not pk:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_datetime ON {table}(datetime)')
+        
+        self.last_processed_candle = None  # Only the latest candle can pass the 5-min freshness filter, so one is enough to avoid duplicates
         self.levels = {}
-        self.atr_14 = 0
-        self.current_price = 0
+        self.broken_levels = []
+        self._day_cache = {'stamp': None}  # date strings for query bounds, rebuilt once per day
+        self._backtest_conn = None  # opened on first backtest() call
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='monitor-5min')  # reads conn_5min during update_all_levels
+        self._daily_levels = {}
+        self._levels_cache_key = None     # (date, hour, quarter) the daily levels/ATR were built for
+        self._5min_data_version = None    # PRAGMA data_version at the last 15-min aggregation
+        self.atr_14 = 0.0
+        self._atr_state = {'atr': None, 'count': 0, 'last_date': None, 'prev_close': None}
+        self.current_price = 0.0
         self.last_update = None
         
         # Initialize levels
@@ -42,244 +226,255 @@ class FixedPranniMonitor:
     
     def force_aggregate_latest_data(self):
         """Force aggregate any missing 5-min data to 15-min"""
-        today = datetime.now().date().strftime('%Y-%m-%d')
+        days = self._day_cache
         
         # Get today's 5-min data (volume not needed for NIFTY)
-        query_5min = f"""
-        SELECT datetime, open, high, low, close, 0 as volume
-        FROM data_5min 
-        WHERE datetime LIKE '{today}%'
-        ORDER BY datetime
-        """
-        df_5min = pd.read_sql_query(query_5min, self.conn_5min)
-        
-        if df_5min.empty:
-            return
+        candles = self.conn_5min.execute(TODAY_5MIN_SQL, (days['today'], days['tomorrow'])).fetchall()
         
-        # Convert to datetime and aggregate to 15-min
-        df_5min['datetime'] = pd.to_datetime(df_5min['datetime'])
-        df_5min.set_index('datetime', inplace=True)
-        
-        # Aggregate to 15-min
-        df_15min = df_5min.resample('15min').agg({
-            'open': 'first',
-            'high': 'max',
-            'low': 'min', 
-            'close': 'last',
-            'volume': 'sum'
-        }).dropna()
-        
-        if df_15min.empty:
+        if not candles:
             return
         
-        # Save to database (INSERT OR REPLACE to update existing)
-        df_15min.reset_index(inplace=True)
-        df_15min['datetime'] = df_15min['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        for _, row in df_15min.iterrows():
-            self.conn_15min.execute("""
-                INSERT OR REPLACE INTO data_15min (datetime, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (row['datetime'], row['open'], row['high'], row['low'], row['close'], row['volume']))
+        # Aggregate to 15-min. Candles come sorted by time, so each clock-aligned 15-min
+        # bucket (same alignment as resample('15min')) is a contiguous run of rows and
+        # reduceat folds every run in one pass over the arrays
+        times, opens, highs, lows, closes, volumes = zip(*candles)
+        buckets = np.array(times, dtype='datetime64[s]').astype(np.int64) // 900
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(candles)] - 1
+        
+        labels = np.datetime_as_string((buckets[starts] * 900).astype('datetime64[s]'))
+        
+        # Save to database (INSERT OR REPLACE to update existing); tolist() gives plain
+        # Python scalars sqlite3 can bind
+        rows = zip(
+            [label.replace('T', ' ') for label in labels],
+            np.array(opens, dtype=np.float64)[starts].tolist(),
+            np.maximum.reduceat(np.array(highs, dtype=np.float64), starts).tolist(),
+            np.minimum.reduceat(np.array(lows, dtype=np.float64), starts).tolist(),
+            np.array(closes, dtype=np.float64)[ends].tolist(),
+            np.add.reduceat(np.array(volumes, dtype=np.int64), starts).tolist()
+        )
         
-        self.conn_15min.commit()
+        # One transaction for the whole day instead of a commit per candle
+        with self.conn_15min:
+            self.conn_15min.executemany(UPSERT_15MIN_SQL, rows)
         
     def calculate_atr(self):
-        """Calculate 14-day ATR"""
-        query = """
-        SELECT 
-            date(datetime) as date,
-            MAX(high) as high,
-            MIN(low) as low,
-            (SELECT close FROM data_15min WHERE date(datetime) = date(d.datetime) ORDER BY datetime DESC LIMIT 1) as close
-        FROM data_15min d
-        WHERE datetime >= date('now', '-60 days')
-        GROUP BY date(datetime)
-        ORDER BY date
-        LIMIT 14
         """
+        Calculate 14-day ATR, Wilder-smoothed: ATR = (ATR_prev * 13 + TR) / 14.
+        Seeded from the last 60 days on the first call (plain mean of the first
+        14 TRs); after that only daily candles added since are folded in
+        """
+        state = self._atr_state
+        since = state['last_date'] or self._day_cache['atr_start']
+        days = self.conn_1day.execute(ATR_DAYS_SQL, (since, self._day_cache['today'])).fetchall()
         
-        df = pd.read_sql_query(query, self.conn_15min)
-        
-        if len(df) < 2:
-            self.atr_14 = 50  # Default ATR
-            return
-        
-        # Calculate True Range for each day
-        true_ranges = []
-        for i in range(1, len(df)):
-            current_high = df.iloc[i]['high']
-            current_low = df.iloc[i]['low']
-            prev_close = df.iloc[i-1]['close']
+        if days:
+            high, low, close = np.array([day[1:] for day in days], dtype=np.float64).T
+            
+            # True Range for each new day, against the previous day's close
+            if state['prev_close'] is None:
+                prev_close = close[:-1]
+                high, low = high[1:], low[1:]
+            else:
+                prev_close = np.concatenate(([state['prev_close']], close[:-1]))
+            true_ranges = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
             
-            tr1 = current_high - current_low
-            tr2 = abs(current_high - prev_close)
-            tr3 = abs(current_low - prev_close)
+            # Plain mean until the first 14 TRs are in, Wilder smoothing after that
+            seed = min(ATR_PERIOD - state['count'], len(true_ranges))
+            if seed > 0:
+                total = (state['atr'] or 0.0) * state['count'] + true_ranges[:seed].sum()
+                state['count'] += seed
+                state['atr'] = float(total / state['count'])
+            for true_range in true_ranges[seed:]:
+                state['atr'] = float((state['atr'] * (ATR_PERIOD - 1) + true_range) / ATR_PERIOD)
             
-            true_range = max(tr1, tr2, tr3)
-            true_ranges.append(true_range)
+            state['prev_close'] = float(close[-1])
+            state['last_date'] = days[-1][0]
         
-        self.atr_14 = np.mean(true_ranges) if true_ranges else 50
+        self.atr_14 = state['atr'] if state['atr'] is not None else 50.0  # Default ATR
     
-    def get_all_trading_levels(self):
+    def _fetch_today_5min(self):
+        """Today's 5-min candles: datetime, open, high, low, close, volume"""
+        today_range = (self._day_cache['today'], self._day_cache['tomorrow'])
+        return self.conn_5min.execute(TODAY_5MIN_SQL, today_range).fetchall()
+    
+    def get_all_trading_levels(self, today_rows=None):
         """Get ALL trading levels including 5-minute levels"""
-        today = datetime.now().date().strftime('%Y-%m-%d')
-        yesterday = (datetime.now() - timedelta(days=1)).date().strftime('%Y-%m-%d')
-        
         levels = {}
         
-        # 1. TODAY'S 5-MINUTE LEVELS
-        
-        # Session High/Low (all candles today)
-        session_query = f"""
-        SELECT MIN(low) as session_low, MAX(high) as session_high, COUNT(*) as candle_count
-        FROM data_5min 
-        WHERE datetime LIKE '{today}%'
-        """
-        df_session = pd.read_sql_query(session_query, self.conn_5min)
-        
-        if not df_session.empty and df_session['session_low'].iloc[0] is not None:
-            levels['Today Session'] = {
-                'high': df_session['session_high'].iloc[0],
-                'low': df_session['session_low'].iloc[0],
-                'type': '5min_session',
-                'candles': df_session['candle_count'].iloc[0]
-            }
-        
-        # Opening Range (first 3 candles: 9:15, 9:20, 9:25)
-        opening_query = f"""
-        SELECT MIN(low) as opening_low, MAX(high) as opening_high, COUNT(*) as opening_candles
-        FROM (
-            SELECT low, high
-            FROM data_5min 
-            WHERE datetime LIKE '{today}%'
-            ORDER BY datetime 
-            LIMIT 3
-        )
-        """
-        df_opening = pd.read_sql_query(opening_query, self.conn_5min)
-        
-        if not df_opening.empty and df_opening['opening_low'].iloc[0] is not None:
-            levels['Opening Range'] = {
-                'high': df_opening['opening_high'].iloc[0],
-                'low': df_opening['opening_low'].iloc[0],
-                'type': '5min_opening',
-                'candles': df_opening['opening_candles'].iloc[0]
-            }
-        
-        # First Candle (9:15 AM only - market opens at 9:15)
-        first_candle_query = f"""
-        SELECT low as first_low, high as first_high, open as first_open, close as first_close
-        FROM data_5min 
-        WHERE datetime LIKE '{today}%'
-        AND TIME(datetime) >= '09:15:00'
-        ORDER BY datetime 
-        LIMIT 1
-        """
-        df_first = pd.read_sql_query(first_candle_query, self.conn_5min)
+        # 1. TODAY'S 5-MINUTE LEVELS (one fetch of today's candles, unless the caller already has them)
+        if today_rows is None:
+            today_rows = self._fetch_today_5min()
+        
+        if today_rows:
+            # Session High/Low (all candles today)
+            levels['Today Session'] = Level(
+                high=max(row[2] for row in today_rows),
+                low=min(row[3] for row in today_rows),
+                type='5min_session',
+                candles=len(today_rows)
+            )
+            
+            # Opening Range (first 3 candles: 9:15, 9:20, 9:25)
+            opening = today_rows[:3]
+            levels['Opening Range'] = Level(
+                high=max(row[2] for row in opening),
+                low=min(row[3] for row in opening),
+                type='5min_opening',
+                candles=len(opening)
+            )
+            
+            # First Candle (9:15 AM only - market opens at 9:15)
+            first = next((row for row in today_rows if row[0][11:19] >= '09:15:00'), None)
+            if first is not None:
+                levels['First Candle'] = Level(
+                    high=first[2],
+                    low=first[3],
+                    open=first[1],
+                    close=first[4],
+                    type='5min_first'
+                )
+        
+        # 2-3. PREVIOUS DAY / WEEKLY / MONTHLY LEVELS (cached by update_all_levels)
+        for name, level_data in self._daily_levels.items():
+            levels[name] = replace(level_data)  # update_all_levels sets per-poll fields on these
         
-        if not df_first.empty and df_first['first_low'].iloc[0] is not None:
-            levels['First Candle'] = {
-                'high': df_first['first_high'].iloc[0],
-                'low': df_first['first_low'].iloc[0],
-                'open': df_first['first_open'].iloc[0],
-                'close': df_first['first_close'].iloc[0],
-                'type': '5min_first'
-            }
+        return levels
+    
+    def get_daily_levels(self):
+        """Previous Day, 1 Week, 2 Weeks and 1 Month levels - from completed candles only"""
+        days = self._day_cache
+        levels = {}
         
         # 2. PREVIOUS DAY LEVELS
-        prev_day_query = f"""
-        SELECT MIN(low) as low, MAX(high) as high, 
-               (SELECT open FROM data_15min WHERE datetime LIKE '{yesterday}%' ORDER BY datetime LIMIT 1) as prev_open,
-               (SELECT close FROM data_15min WHERE datetime LIKE '{yesterday}%' ORDER BY datetime DESC LIMIT 1) as prev_close
-        FROM data_15min 
-        WHERE datetime LIKE '{yesterday}%'
-        """
-        df_prev_day = pd.read_sql_query(prev_day_query, self.conn_15min)
-        
-        if not df_prev_day.empty and df_prev_day['high'].iloc[0] is not None:
-            levels['Previous Day'] = {
-                'high': df_prev_day['high'].iloc[0],
-                'low': df_prev_day['low'].iloc[0],
-                'open': df_prev_day['prev_open'].iloc[0],
-                'close': df_prev_day['prev_close'].iloc[0],
-                'type': 'previous_day'
-            }
+        prev_low, prev_high, prev_open, prev_close = self.conn_15min.execute(
+            PREV_DAY_SQL, (days['yesterday'], days['today']) * 3
+        ).fetchone()
+        
+        if prev_high is not None:
+            levels['Previous Day'] = Level(
+                high=prev_high,
+                low=prev_low,
+                open=prev_open,
+                close=prev_close,
+                type='previous_day'
+            )
         
         # 3. WEEKLY/MONTHLY LEVELS (use daily data for accuracy)
         timeframes = {
-            '1 Week': 7,
-            '2 Weeks': 14,
-            '1 Month': 30
+            '1 Week': 'wk1',
+            '2 Weeks': 'wk2',
+            '1 Month': 'mo1'
         }
         
-        for name, days in timeframes.items():
-            start_date = (datetime.now() - timedelta(days=days)).date().strftime('%Y-%m-%d')
-            query = f"""
-            SELECT MIN(low) as low, MAX(high) as high
-            FROM data_1day 
-            WHERE datetime >= '{start_date}' AND datetime < '{today}'
-            """
-            df_level = pd.read_sql_query(query, self.conn_1day)
+        buckets = {
+            lookback: (low, high)
+            for lookback, low, high in self.conn_1day.execute(
+                DAILY_RANGES_SQL, (days['wk1'], days['wk2'], days['mo1'], days['today'])
+            ).fetchall()
+        }
+        
+        # Shortest lookback first, each one widening the previous range with its own bucket
+        low = high = None
+        for name, lookback in timeframes.items():
+            if lookback in buckets:
+                bucket_low, bucket_high = buckets[lookback]
+                low = bucket_low if low is None else min(low, bucket_low)
+                high = bucket_high if high is None else max(high, bucket_high)
             
-            if not df_level.empty and df_level['high'].iloc[0] is not None:
-                levels[name] = {
-                    'high': df_level['high'].iloc[0],
-                    'low': df_level['low'].iloc[0],
-                    'type': 'historical'
-                }
+            if high is not None:
+                levels[name] = Level(high=high, low=low, type='historical')
         
         return levels
     
+    def _refresh_day_cache(self, now):
+        """Rebuild the date strings used as query bounds when the day changes"""
+        today = now.date()
+        if today == self._day_cache['stamp']:
+            return
+        
+        def day(offset):
+            return (today + timedelta(days=offset)).strftime('%Y-%m-%d')
+        
+        self._day_cache = {
+            'stamp': today,
+            'today': day(0),
+            'tomorrow': day(1),
+            'yesterday': day(-1),
+            'wk1': day(-7),
+            'wk2': day(-14),
+            'mo1': day(-30),
+            'atr_start': day(-60)
+        }
+    
     def update_all_levels(self):
         """Update all levels and current price"""
-        # Force aggregate latest data first
-        self.force_aggregate_latest_data()
-        
-        # Calculate ATR
-        self.calculate_atr()
+        now = datetime.now()
+        self._refresh_day_cache(now)
+        
+        # Force aggregate latest data first - only when the collector has committed
+        # to the 5-min DB since last time (data_version changes on other connections' writes)
+        data_version = self.conn_5min.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._5min_data_version:
+            self.force_aggregate_latest_data()
+            self._5min_data_version = data_version
+        
+        # Today's 5-min candles are read on the pool thread while this thread does the
+        # daily/15-min reads below: separate DB files and connections, and sqlite3
+        # releases the GIL while a query runs
+        today_rows = self._executor.submit(self._fetch_today_5min)
+        
+        # ATR and the previous-day/weekly/monthly levels only use completed candles.
+        # Refresh them once per 15-min bucket (picks up late backfills), not every poll
+        cache_key = (now.date(), now.hour, now.minute // 15)
+        if cache_key != self._levels_cache_key:
+            self.calculate_atr()
+            self._daily_levels = self.get_daily_levels()
+            self._levels_cache_key = cache_key
         
         # Get current price from latest 15-min candle
-        query_current = """
-        SELECT close, datetime 
-        FROM data_15min 
-        ORDER BY datetime DESC 
-        LIMIT 1
-        """
-        df_current = pd.read_sql_query(query_current, self.conn_15min)
+        current = self.conn_15min.execute(CURRENT_PRICE_SQL).fetchone()
         
-        if not df_current.empty:
-            self.current_price = df_current['close'].iloc[0]
-            self.last_update = df_current['datetime'].iloc[0]
+        if current is not None:
+            price, self.last_update = current
+            self.current_price = float(price)
         
         # Get all levels
-        all_levels = self.get_all_trading_levels()
+        all_levels = self.get_all_trading_levels(today_rows.result())
         
         # Add breakout status and probabilities to each level
-        for name, level_data in all_levels.items():
-            if 'high' in level_data and 'low' in level_data:
-                # Calculate distances
-                high_dist = level_data['high'] - self.current_price
-                low_dist = self.current_price - level_data['low']
-                high_dist_atr = high_dist / self.atr_14 if self.atr_14 > 0 else 0
-                low_dist_atr = low_dist / self.atr_14 if self.atr_14 > 0 else 0
-                
-                # Calculate probabilities
-                high_prob = self._calculate_probability(abs(high_dist_atr))
-                low_prob = self._calculate_probability(abs(low_dist_atr))
-                
-                level_data.update({
-                    'high_distance': high_dist,
-                    'low_distance': low_dist,
-                    'high_dist_atr': high_dist_atr,
-                    'low_dist_atr': low_dist_atr,
-                    'high_probability': high_prob,
-                    'low_probability': low_prob,
-                    'high_broken': self.current_price > level_data['high'],
-                    'low_broken': self.current_price < level_data['low']
-                })
+        for level in all_levels.values():
+            # Calculate distances
+            level.high_distance = level.high - self.current_price
+            level.low_distance = self.current_price - level.low
+            level.high_dist_atr = level.high_distance / self.atr_14 if self.atr_14 > 0 else 0
+            level.low_dist_atr = level.low_distance / self.atr_14 if self.atr_14 > 0 else 0
+            
+            # Calculate probabilities
+            level.high_probability = self._calculate_probability(abs(level.high_dist_atr))
+            level.low_probability = self._calculate_probability(abs(level.low_dist_atr))
+            
+            level.high_broken = self.current_price > level.high
+            level.low_broken = self.current_price < level.low
         
         self.levels = all_levels
+        
+        # Summary of broken levels for get_live_status
+        self.broken_levels = []
+        for timeframe, level in all_levels.items():
+            if level.high_broken:
+                self.broken_levels.append(f"{timeframe} High ({level.high:.2f})")
+            if level.low_broken:
+                self.broken_levels.append(f"{timeframe} Low ({level.low:.2f})")
+        
+        # Same levels as parallel arrays for the vectorised breakout check (the Opening
+        # Range's fresh breakouts outrank everything else: 90 vs 70)
+        self._lv_names = list(all_levels)
+        self._lv_highs = np.array([level.high for level in all_levels.values()], dtype=np.float64)
+        self._lv_lows = np.array([level.low for level in all_levels.values()], dtype=np.float64)
+        self._lv_opening = np.array([name == 'Opening Range' for name in all_levels], dtype=bool)
+        self._lv_probs = np.where(self._lv_opening, 90, 70)
     
     def _calculate_probability(self, dist_atr):
         """Calculate breakout probability based on ATR distance"""
@@ -297,38 +492,30 @@ class FixedPranniMonitor:
         # Update levels with latest data
         self.update_all_levels()
         
-        # Get latest completed 15-min candle
-        query = """
-        SELECT datetime, open, high, low, close 
-        FROM data_15min 
-        ORDER BY datetime DESC 
-        LIMIT 1
-        """
-        df_candle = pd.read_sql_query(query, self.conn_15min)
+        # Get latest completed 15-min candle (and the previous one, for the FRESH checks below)
+        candles = self.conn_15min.execute(LAST_2_CANDLES_SQL).fetchall()
         
-        if df_candle.empty:
+        if not candles:
             return None
         
-        candle = df_candle.iloc[0]
-        candle_close = float(candle['close'])
-        candle_time = candle['datetime']
+        candle_time, candle_open, _, _, candle_close = candles[0]
+        candle_open, candle_close = float(candle_open), float(candle_close)
         
         # ⚡ CRITICAL TIMING CHECK: Only trade within 5 minutes of candle completion
         try:
-            candle_dt = datetime.strptime(candle_time, '%Y-%m-%d %H:%M:%S')
-            now = datetime.now()
+            candle_ts = datetime.fromisoformat(candle_time).timestamp()
             
             # 15-min candles: 9:15 candle completes at 9:30, 9:30 candle completes at 9:45, etc.
-            # Completion time = candle_time + 15 minutes
-            candle_completion_time = candle_dt + timedelta(minutes=15)
-            minutes_since_completion = (now - candle_completion_time).total_seconds() / 60
+            # Completion time = candle_time + 15 minutes (plain epoch seconds, no timedelta)
+            completion_ts = candle_ts + 900
+            minutes_since_completion = (time.time() - completion_ts) / 60
             
             if minutes_since_completion > 5:  # More than 5 minutes since completion
-                print(f"⏰ TIMING FILTER: Candle completed at {candle_completion_time.strftime('%H:%M:%S')}, {minutes_since_completion:.1f}m ago - TOO OLD")
+                print(f"⏰ TIMING FILTER: Candle completed at {time.strftime('%H:%M:%S', time.localtime(completion_ts))}, {minutes_since_completion:.1f}m ago - TOO OLD")
                 return None
             
             if minutes_since_completion < 0:  # Candle hasn't completed yet
-                print(f"⏰ Candle hasn't completed yet (completes at {candle_completion_time.strftime('%H:%M:%S')})")
+                print(f"⏰ Candle hasn't completed yet (completes at {time.strftime('%H:%M:%S', time.localtime(completion_ts))})")
                 return None
             
             print(f"✅ FRESH CANDLE: {candle_time} completed {minutes_since_completion:.1f}m ago - VALID for trading")
@@ -338,15 +525,15 @@ class FixedPranniMonitor:
             return None
         
         # Skip if we already processed this exact candle
-        if candle_time in self.processed_candles:
+        if candle_time == self.last_processed_candle:
             return None
         
         # 🚨 GAP FILTER: Check for gap-up/gap-down from Previous Day High/Low
         pdh = None
         pdl = None
         if 'Previous Day' in self.levels:
-            pdh = self.levels['Previous Day'].get('high')
-            pdl = self.levels['Previous Day'].get('low')
+            pdh = self.levels['Previous Day'].high
+            pdl = self.levels['Previous Day'].low
         
         gap_up_detected = False
         gap_down_detected = False
@@ -354,25 +541,22 @@ class FixedPranniMonitor:
         
         if pdh and pdl:
             # Check if we're in a gap situation (first candle of the day)
-            candle_hour = candle_dt.hour
-            candle_minute = candle_dt.minute
-            
             # First 15-min candle is at 9:15, completes at 9:30
-            is_first_candle = (candle_hour == 9 and candle_minute == 15)
+            is_first_candle = candle_time[11:16] == '09:15'  # 'YYYY-MM-DD HH:MM:SS' text
             
             if is_first_candle:
-                gap_size_up = candle['open'] - pdh
-                gap_size_down = pdl - candle['open']
+                gap_size_up = candle_open - pdh
+                gap_size_down = pdl - candle_open
                 
                 # Option 1: GAP FILTER (>50 points gap)
                 if gap_size_up > 50:
                     gap_up_detected = True
-                    print(f"⚠️  GAP-UP DETECTED: Opening at ₹{candle['open']:.2f}, PDH was ₹{pdh:.2f} (+{gap_size_up:.2f} points)")
+                    print(f"⚠️  GAP-UP DETECTED: Opening at ₹{candle_open:.2f}, PDH was ₹{pdh:.2f} (+{gap_size_up:.2f} points)")
                     print(f"    🎯 Strategy: Will only trade on RETEST of PDH (within ±20 points)")
                 
                 if gap_size_down > 50:
                     gap_down_detected = True
-                    print(f"⚠️  GAP-DOWN DETECTED: Opening at ₹{candle['open']:.2f}, PDL was ₹{pdl:.2f} (-{gap_size_down:.2f} points)")
+                    print(f"⚠️  GAP-DOWN DETECTED: Opening at ₹{candle_open:.2f}, PDL was ₹{pdl:.2f} (-{gap_size_down:.2f} points)")
                     print(f"    🎯 Strategy: Will only trade on RETEST of PDL (within ±20 points)")
             
             # Option 2: RETEST ZONE CHECK (within ±20 points of PDH/PDL)
@@ -389,102 +573,80 @@ class FixedPranniMonitor:
                 print(f"🚫 GAP FILTER: Skipping trade - waiting for retest of PDH/PDL")
                 return None
         
-        # Find FRESH breakouts - ONLY trade when breakout FIRST occurs
-        breakouts = []
-        
-        # Check if this specific candle created a NEW breakout (not continuation of old one)
-        for timeframe, level_data in self.levels.items():
-            
-            # Get previous 15-min candle to check if breakout is FRESH
-            query_prev = """
-            SELECT datetime, close 
-            FROM data_15min 
-            ORDER BY datetime DESC 
-            LIMIT 2
-            """
-            df_prev = pd.read_sql_query(query_prev, self.conn_15min)
+        # Find FRESH breakouts - ONLY trade when breakout FIRST occurs. Checked for all levels
+        # at once on the arrays built in update_all_levels: the Opening Range only counts a
+        # FRESH cross (previous candle on the other side), every other level counts whenever
+        # the close is beyond it
+        prev_close = float(candles[1][4]) if len(candles) >= 2 else None
+        curr_close = candle_close
+        highs, lows, opening = self._lv_highs, self._lv_lows, self._lv_opening
+        
+        if prev_close is not None:
+            fresh_high = (prev_close <= highs) & (curr_close > highs)
+            fresh_low = (prev_close >= lows) & (curr_close < lows)
+        else:
+            fresh_high = fresh_low = np.zeros(len(highs), dtype=bool)
+        
+        high_break = np.where(opening, fresh_high, candle_close > highs)
+        low_break = np.where(opening, fresh_low, candle_close < lows)
+        
+        # Candidates interleaved (level 0 high, level 0 low, level 1 high, ...) so argmax
+        # picks the first highest-probability one, in the same order as the old loop
+        scores = np.where(np.column_stack((high_break, low_break)), self._lv_probs[:, None], -1).ravel()
+        
+        if len(scores) and scores.max() >= 0:
+            best = int(np.argmax(scores))
+            timeframe = self._lv_names[best // 2]
+            level_data = self.levels[timeframe]
             
-            if len(df_prev) >= 2:
-                current_candle = df_prev.iloc[0]
-                previous_candle = df_prev.iloc[1] 
-                
-                prev_close = float(previous_candle['close'])
-                curr_close = float(current_candle['close'])
-                
-                # 🎯 OPENING 5-MIN HIGH BREAKOUT - ONLY if FRESH breakout
-                if (timeframe == 'Opening Range' and 'high' in level_data):
-                    level_high = level_data['high']
-                    
-                    # FRESH breakout: previous candle below, current candle above
-                    if prev_close <= level_high and curr_close > level_high:
-                        breakouts.append({
-                            'type': 'FRESH_BREAKOUT',
-                            'direction': 'CALL',
-                            'timeframe': 'opening_5min_high',
-                            'level': level_high,
-                            'close_price': curr_close,
-                            'candle_time': candle_time,
-                            'level_type': 'opening_high_fresh',
-                            'probability': 90,  # Very high for fresh breakouts
-                            'distance_atr': 0.8,
-                            'breakout_margin': curr_close - level_high
-                        })
-                
-                # 🎯 OPENING 5-MIN LOW BREAKDOWN - ONLY if FRESH breakdown  
-                if (timeframe == 'Opening Range' and 'low' in level_data):
-                    level_low = level_data['low']
-                    
-                    # FRESH breakdown: previous candle above, current candle below
-                    if prev_close >= level_low and curr_close < level_low:
-                        breakouts.append({
-                            'type': 'FRESH_BREAKDOWN',
-                            'direction': 'PUT', 
-                            'timeframe': 'opening_5min_low',
-                            'level': level_low,
-                            'close_price': curr_close,
-                            'candle_time': candle_time,
-                            'level_type': 'opening_low_fresh',
-                            'probability': 90,  # Very high for fresh breakdowns
-                            'distance_atr': 0.8,
-                            'breakdown_margin': level_low - curr_close
-                        })
+            # Return the BEST breakout (highest probability, closest level)
+            if opening[best // 2] and best % 2 == 0:
+                # 🎯 OPENING 5-MIN HIGH BREAKOUT - FRESH breakout: previous candle below, current candle above
+                level_high = level_data.high
+                best_breakout = {
+                    'type': 'FRESH_BREAKOUT',
+                    'direction': 'CALL',
+                    'timeframe': 'opening_5min_high',
+                    'level': level_high,
+                    'close_price': curr_close,
+                    'candle_time': candle_time,
+                    'level_type': 'opening_high_fresh',
+                    'probability': 90,  # Very high for fresh breakouts
+                    'distance_atr': 0.8,
+                    'breakout_margin': curr_close - level_high
+                }
+            elif opening[best // 2]:
+                # 🎯 OPENING 5-MIN LOW BREAKDOWN - FRESH breakdown: previous candle above, current candle below
+                level_low = level_data.low
+                best_breakout = {
+                    'type': 'FRESH_BREAKDOWN',
+                    'direction': 'PUT',
+                    'timeframe': 'opening_5min_low',
+                    'level': level_low,
+                    'close_price': curr_close,
+                    'candle_time': candle_time,
+                    'level_type': 'opening_low_fresh',
+                    'probability': 90,  # Very high for fresh breakdowns
+                    'distance_atr': 0.8,
+                    'breakdown_margin': level_low - curr_close
+                }
+            else:
+                # Secondary signals (lower priority): other high breakouts / low breakdowns
+                is_high = best % 2 == 0
+                best_breakout = {
+                    'type': 'BREAKOUT' if is_high else 'BREAKDOWN',
+                    'direction': 'CALL' if is_high else 'PUT',
+                    'timeframe': timeframe,
+                    'level': level_data.high if is_high else level_data.low,
+                    'close_price': candle_close,
+                    'candle_time': candle_time,
+                    'level_type': level_data.type,
+                    'probability': 70,
+                    'distance_atr': 0.3
+                }
             
-            # Secondary signals (lower priority)
-            if timeframe != 'Opening Range':
-                # Other high breakouts
-                if 'high' in level_data and candle_close > level_data['high']:
-                    breakouts.append({
-                        'type': 'BREAKOUT',
-                        'direction': 'CALL',
-                        'timeframe': timeframe,
-                        'level': level_data['high'],
-                        'close_price': candle_close,
-                        'candle_time': candle_time,
-                        'level_type': level_data.get('type', 'unknown'),
-                        'probability': 70,
-                        'distance_atr': 0.3
-                    })
-                
-                # Other low breakdowns
-                if 'low' in level_data and candle_close < level_data['low']:
-                    breakouts.append({
-                        'type': 'BREAKDOWN',
-                        'direction': 'PUT', 
-                        'timeframe': timeframe,
-                        'level': level_data['low'],
-                        'close_price': candle_close,
-                        'candle_time': candle_time,
-                        'level_type': level_data.get('type', 'unknown'),
-                        'probability': 70,
-                        'distance_atr': 0.3
-                    })
-        
-        if breakouts:
             # Mark this candle as processed
-            self.processed_candles.add(candle_time)
-            
-            # Return the BEST breakout (highest probability, closest level)
-            best_breakout = max(breakouts, key=lambda x: (x['probability'], -abs(x['distance_atr'])))
+            self.last_processed_candle = candle_time
             
             print(f"🚨 {best_breakout['type']} DETECTED!")
             print(f"   📊 {best_breakout['timeframe']} {best_breakout['level']:.2f} broken @ {best_breakout['close_price']:.2f}")
@@ -504,35 +666,83 @@ class FixedPranniMonitor:
             'atr_14': self.atr_14,
             'last_update': self.last_update,
             'levels': self.levels,
-            'processed_candles': len(self.processed_candles)
+            'processed_candles': 1 if self.last_processed_candle else 0
         }
         
-        # Add summary of broken levels
-        broken_levels = []
-        for timeframe, level_data in self.levels.items():
-            if level_data.get('high_broken'):
-                broken_levels.append(f"{timeframe} High ({level_data['high']:.2f})")
-            if level_data.get('low_broken'):
-                broken_levels.append(f"{timeframe} Low ({level_data['low']:.2f})")
-        
-        status['broken_levels'] = broken_levels
-        status['total_broken'] = len(broken_levels)
+        # Add summary of broken levels (built by update_all_levels)
+        status['broken_levels'] = self.broken_levels
+        status['total_broken'] = len(self.broken_levels)
         
         return status
+    
+    def backtest(self, start, end):
+        """
+        Opening Range FRESH breakouts/breakdowns (the 90% signals, gap filter included)
+        on every 15-min candle from `start` up to `end` ('YYYY-MM-DD', end exclusive),
+        all days in a single query. Ignores the live 5-minute freshness window
+        """
+        if self._backtest_conn is None:
+            self._backtest_conn = sqlite3.connect(DB_PATH_15MIN, check_same_thread=False)
+            self._backtest_conn.execute('ATTACH DATABASE ? AS m5', (DB_PATH_5MIN,))
+        
+        prev_start = (datetime.fromisoformat(start) - timedelta(days=1)).strftime('%Y-%m-%d')
+        rows = self._backtest_conn.execute(BACKTEST_SQL, (end, start, end, prev_start, end, start)).fetchall()
+        
+        signals = []
+        for candle_time, close, prev_close, or_high, or_low in rows:
+            if close > or_high:
+                signals.append({
+                    'type': 'FRESH_BREAKOUT',
+                    'direction': 'CALL',
+                    'timeframe': 'opening_5min_high',
+                    'level': or_high,
+                    'close_price': close,
+                    'candle_time': candle_time,
+                    'level_type': 'opening_high_fresh',
+                    'probability': 90,
+                    'distance_atr': 0.8,
+                    'breakout_margin': close - or_high
+                })
+            else:
+                signals.append({
+                    'type': 'FRESH_BREAKDOWN',
+                    'direction': 'PUT',
+                    'timeframe': 'opening_5min_low',
+                    'level': or_low,
+                    'close_price': close,
+                    'candle_time': candle_time,
+                    'level_type': 'opening_low_fresh',
+                    'probability': 90,
+                    'distance_atr': 0.8,
+                    'breakdown_margin': or_low - close
+                })
+        
+        return signals
+    
+    def close(self):
+        """Close the database connections"""
+        self._executor.shutdown()
+        for conn in (self.conn_15min, self.conn_5min, self.conn_1day, self._backtest_conn):
+            if conn is not None:
+                conn.close()
 
 # Global instance for easy import
 _monitor_instance = None
+_monitor_lock = threading.Lock()
 
 def get_fixed_monitor():
     """Get the global fixed monitor instance"""
     global _monitor_instance
     if _monitor_instance is None:
-        _monitor_instance = super_pranni_monitor()
+        with _monitor_lock:
+            # Re-check: another thread may have created it while we waited
+            if _monitor_instance is None:
+                _monitor_instance = FixedPranniMonitor()
     return _monitor_instance
 
 if __name__ == "__main__":
     # Test the fixed monitor
-    monitor = super_pranni_monitor()
+    monitor = FixedPranniMonitor()
     
     print("\n📊 TESTING FIXED BREAKOUT DETECTION")
     print("=" * 50)
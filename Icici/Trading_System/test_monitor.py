@@ -2,10 +2,10 @@
 """Quick test of Super Pranni Monitor"""
 import sys
 sys.path.insert(0, r'd:\Algo Trading\Icici\Trading_System')
-from super_pranni_monitor import super_pranni_monitor
+from super_pranni_monitor import FixedPranniMonitor
 
 print("Testing Super Pranni Monitor...")
-m = super_pranni_monitor()
+m = FixedPranniMonitor()
 print("✅ Monitor initialized OK")
 
 s = m.get_live_status()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test that RealTrader stops monitoring a trade closed by another process (emergency_exit.py etc.)"""
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import real_trader
+from real_trader import RealTrader
+import asyncio
+
+# Throwaway paper_trades.db with two open trades
+db_path = os.path.join(tempfile.mkdtemp(), 'paper_trades.db')
+real_trader.DB_PAPER_TRADES = db_path
+conn = sqlite3.connect(db_path)
+conn.execute('''
+    CREATE TABLE real_trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, strike INTEGER, direction TEXT,
+        entry_premium REAL, quantity INTEGER, breakout_level REAL, order_id TEXT,
+        sl_candle_count INTEGER, last_sl_check_time TEXT, status TEXT
+    )
+''')
+conn.executemany('''
+    INSERT INTO real_trades (timestamp, strike, direction, entry_premium, quantity, breakout_level,
+                             order_id, sl_candle_count, last_sl_check_time, status)
+    VALUES (?, ?, ?, 100.0, 75, 0, ?, 0, ?, 'OPEN')
+''', [('2025-11-12T09:20:00', 25900, 'CALL', 'ORD1', '2025-11-12T09:20:00'),
+      ('2025-11-12T09:25:00', 25800, 'PUT', 'ORD2', '2025-11-12T09:25:00')])
+conn.commit()
+conn.close()
+
+print("Testing RealTrader open-trade cache...")
+# Breakout detection is not under test and needs the candle databases
+real_trader.FixedPranniMonitor = lambda: None
+trader = RealTrader()
+
+# Record which trades get a premium check; None skips target/SL handling
+monitored = []
+async def fake_premium(strike, direction, contract=None):
+    monitored.append(strike)
+    return None
+trader.get_option_premium = fake_premium
+
+asyncio.run(trader.monitor_open_trades())
+assert sorted(monitored) == [25800, 25900], monitored
+print(f"✅ Monitoring both open trades: {monitored}")
+
+# Close one trade the way emergency_exit.py does - its own connection, its own commit
+conn = sqlite3.connect(db_path)
+conn.execute("UPDATE real_trades SET status = 'CLOSED' WHERE order_id = 'ORD1'")
+conn.commit()
+conn.close()
+
+monitored.clear()
+asyncio.run(trader.monitor_open_trades())
+assert monitored == [25800], monitored
+print(f"✅ Externally closed trade no longer monitored: {monitored}")
+
+print("\n✅ Open-trade cache test PASSED")
@@ -7,16 +7,23 @@ ICICI Breeze WebSocket Data Collector
 """
 
 import asyncio
+import atexit
+import collections
 import sqlite3
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time
+from functools import partial
 from breeze_connect import BreezeConnect
 import os
 from dotenv import load_dotenv
 import time as time_module
+import queue
+import threading
 import logging
 from logging.handlers import RotatingFileHandler
+from types import MappingProxyType
 
 # Setup logging with file rotation
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -37,7 +44,162 @@ logger.addHandler(file_handler)
 # Prevent propagation to root logger
 logger.propagate = False
 
+# Historical batch downloads: requests in flight at once, and the minimum gap between
+# request starts (the old serial loop slept 1 second after each batch)
+HISTORICAL_CONCURRENCY = 4
+HISTORICAL_REQUEST_SPACING = 1.0
+
+# Instrument arguments shared by every Breeze historical/quote call for the NIFTY index
+# (read-only, so a call site can't change them for the others)
+NIFTY_CASH = MappingProxyType({
+    'stock_code': "NIFTY",
+    'exchange_code': "NSE",
+    'product_type': "cash",
+    'expiry_date': "",
+    'right': "",
+    'strike_price': ""
+})
+
+def connect_db(db_path):
+    """
+    Open a connection in autocommit mode (transactions are explicit BEGIN/COMMIT)
+    with WAL journaling: one fsync per checkpoint instead of per commit, and the
+    monitor's reads don't block our writes. Reads go through a 256 MB memory map
+    instead of read() calls into the page cache
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=256, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
+def ohlcv_candle(df, candle_datetime):
+    """
+    Fold consecutive candles into one OHLCV candle dict. Reduces the raw column
+    arrays with NumPy - the candles never hold NaN, so pandas' NaN-skipping
+    reductions only add overhead
+    """
+    return {
+        'datetime': candle_datetime,
+        'open': df['open'].values[0],
+        'high': df['high'].values.max(),
+        'low': df['low'].values.min(),
+        'close': df['close'].values[-1],
+        'volume': df['volume'].values.sum()
+    }
+
+def window_candle(conn, table_name, start, end):
+    """
+    Fold the candles with start <= datetime <= end into one OHLCV candle inside
+    SQLite, so only the six aggregates leave the database. The candle is labeled
+    with start. Returns (count, candle) where candle is a (datetime, open, high, low,
+    close, volume) row, or None if the window is empty
+    """
+    count, open_, high, low, close, volume = conn.execute(f'''
+        WITH w AS (
+            SELECT datetime, open, high, low, close, volume FROM {table_name}
+            WHERE datetime >= ? AND datetime <= ?
+        )
+        SELECT COUNT(*),
+               (SELECT open FROM w ORDER BY datetime LIMIT 1),
+               MAX(high), MIN(low),
+               (SELECT close FROM w ORDER BY datetime DESC LIMIT 1),
+               SUM(volume)
+        FROM w
+    ''', (start, end)).fetchone()
+    if count == 0:
+        return 0, None
+    return count, (start, open_, high, low, close, volume)
+
+def datetime_is_primary_key(conn, table_name):
+    """True if the table's datetime column is its PRIMARY KEY (and so already indexed)"""
+    return any(column[1] == 'datetime' and column[5] for column in conn.execute(f'PRAGMA table_info({table_name})'))
+
+def datetime_is_unique(conn, table_name):
+    """True if a UNIQUE index (the PRIMARY KEY's included) covers exactly the datetime column"""
+    for index in conn.execute(f'PRAGMA index_list({table_name})').fetchall():
+        if index[2] and [column[2] for column in conn.execute(f'PRAGMA index_info({index[1]})')] == ['datetime']:
+            return True
+    return False
+
+def candle_upsert(table_name, source='VALUES (?, ?, ?, ?, ?, ?)'):
+    """
+    INSERT of candle rows (source: VALUES or a SELECT) that overwrites the candle
+    already stored for the same datetime in place. Needs the unique datetime that
+    create_database_tables guarantees
+    """
+    return f"""
+        INSERT INTO {table_name} (datetime, open, high, low, close, volume) {source}
+        ON CONFLICT(datetime) DO UPDATE SET
+            open = excluded.open,
+            high = excluded.high,
+            low = excluded.low,
+            close = excluded.close,
+            volume = excluded.volume
+    """
+
+OHLCV_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum'
+}
+
+def candle_columns(df):
+    """
+    Keep the datetime/OHLCV columns of an API response frame, as numeric dtypes:
+    float64 prices and int64 volume instead of whatever the JSON held (numbers as
+    strings make object columns, which reduce slowly and compare as text)
+    """
+    df = df[['datetime', 'open', 'high', 'low', 'close', 'volume']].copy()
+    for column in ('open', 'high', 'low', 'close'):
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype('int64')
+    return df
+
+def candle_row(record):
+    """
+    One API candle record as a (datetime, open, high, low, close, volume) row, with
+    the dtypes candle_columns gives a whole frame: float prices, int volume
+    """
+    return (
+        record['datetime'],
+        float(record['open']),
+        float(record['high']),
+        float(record['low']),
+        float(record['close']),
+        int(float(record.get('volume') or 0))
+    )
+
+def combine_batches(batches):
+    """
+    Concatenate downloaded batches into one frame with parsed datetimes, sorted and
+    without duplicate datetimes. Done in place on the concatenated frame rather than
+    through a new copy per step; save_to_database turns the datetimes back into text
+    """
+    df = pd.concat(batches, ignore_index=True)
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df.drop_duplicates(subset='datetime', inplace=True)
+    df.sort_values('datetime', inplace=True, ignore_index=True)
+    return df
+
+def text_datetime(df):
+    """Turn a datetime-indexed frame back into the datetime text column the databases store"""
+    df = df.reset_index()
+    df['datetime'] = df['datetime'].astype(str)
+    return df
+
 class NiftyDataCollector:
+    # Market hours: download windows, the live feed and the save filter all use these
+    MARKET_OPEN = time(9, 15)
+    MARKET_CLOSE = time(15, 30)
+    # Same bounds as minutes since midnight, for the vectorised filter in save_to_database
+    MARKET_OPEN_MINUTE = MARKET_OPEN.hour * 60 + MARKET_OPEN.minute
+    MARKET_CLOSE_MINUTE = MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute
+    
     def __init__(self):
         """Initialize the data collector"""
         load_dotenv()
@@ -53,8 +215,25 @@ class NiftyDataCollector:
         self.db_1hour = 'NIFTY_1hour_data.db'
         self.db_1day = 'NIFTY_1day_data.db'
         
+        # One long-lived connection per database file, opened on first use: keeps the
+        # page cache warm and lets sqlite3 reuse its compiled statements across saves
+        self._conns = {}
+        
+        # Live-feed writes go through one background writer thread (see queue_write)
+        self._write_q = queue.Queue()
+        self._writer = None
+        atexit.register(self.close)  # a second close() after main()'s is a no-op
+        
+        # Candles the live feed stored lately, as (datetime, open, high, low, close, volume)
+        # rows, so the 15-min / 1-hour aggregations needn't read them back (see recent_window)
+        self._recent_5min = collections.deque(maxlen=15)
+        self._recent_15min = collections.deque(maxlen=15)
+        
         # Initialize Breeze connection
         self.breeze = BreezeConnect(api_key=self.api_key)
+        # One small pool for every blocking Breeze call (see call_breeze), sized for the
+        # concurrent historical batches; the live feed needs just one of its threads
+        self._io_executor = ThreadPoolExecutor(max_workers=HISTORICAL_CONCURRENCY, thread_name_prefix='breeze')
         
         logger.info("✅ NiftyDataCollector initialized")
     
@@ -71,6 +250,28 @@ class NiftyDataCollector:
             logger.error(f"❌ Failed to connect to Breeze: {e}")
             return False
     
+    async def call_breeze(self, func, **kwargs):
+        """Run a blocking Breeze SDK call on the shared I/O pool and await its result"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, partial(func, **kwargs))
+    
+    def get_connection(self, db_path):
+        """Shared connection for a database file (see connect_db)"""
+        conn = self._conns.get(db_path)
+        if conn is None:
+            conn = self._conns[db_path] = connect_db(db_path)
+        return conn
+    
+    def close(self):
+        """Finish queued writes, then close all database connections and the Breeze pool"""
+        self._io_executor.shutdown()
+        if self._writer is not None:
+            self._write_q.put(None)
+            self._writer.join()
+            self._writer = None
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+    
     def create_database_tables(self):
         """Create tables in all databases if they don't exist"""
         databases = [
@@ -82,10 +283,26 @@ class NiftyDataCollector:
         ]
         
         for db_path, table_name in databases:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(f'''
+            conn = self.get_connection(db_path)  # journal_mode=WAL is stored in the file from here on
+            
+            # datetime must be unique for save_to_database's upsert. The PRIMARY KEY already
+            # is a unique index (SQLite's autoindex), so a second index only doubles the
+            # b-tree writes on every insert. Tables written by pandas to_sql have no primary
+            # key: they're deduplicated once and idx_datetime becomes a UNIQUE index
+            table_exists = conn.execute(f'PRAGMA table_info({table_name})').fetchone() is not None
+            if not table_exists or datetime_is_primary_key(conn, table_name):
+                index_sql = 'DROP INDEX IF EXISTS idx_datetime;'
+            elif datetime_is_unique(conn, table_name):
+                index_sql = ''
+            else:
+                self.dedupe_table(db_path, table_name)
+                index_sql = f'''
+                    DROP INDEX IF EXISTS idx_datetime;
+                    CREATE UNIQUE INDEX idx_datetime ON {table_name}(datetime);
+                '''
+            
+            # Table and index in one script: a single round of parsing and schema changes
+            conn.executescript(f'''
                 CREATE TABLE IF NOT EXISTS {table_name} (
                     datetime TEXT PRIMARY KEY,
                     open REAL,
@@ -93,78 +310,73 @@ class NiftyDataCollector:
                     low REAL,
                     close REAL,
                     volume INTEGER
-                )
+                );
+                {index_sql}
+                PRAGMA analysis_limit=1000;
+                ANALYZE {table_name};
             ''')
             
-            # Create index on datetime
-            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_datetime ON {table_name}(datetime)')
-            
-            conn.commit()
-            conn.close()
+            # Warm up: reads the right edge of the datetime index - the pages the live
+            # aggregation windows hit - so the first candle of the day doesn't pay for them.
+            # ANALYZE above (sampled, so cheap on big tables) gives the planner its stats
+            conn.execute(f'SELECT MAX(datetime) FROM {table_name}').fetchone()
             
             logger.info(f"✅ Database ready: {db_path} ({table_name})")
     
-    def save_to_database(self, df, db_path, table_name):
-        """Save dataframe to database, avoiding duplicates"""
+    def save_to_database(self, df, db_path, table_name, bulk=False):
+        """
+        Save dataframe to database, avoiding duplicates. bulk=True is for the large
+        historical downloads: rows go through a staging table written with multi-row
+        INSERTs, then into the table with one INSERT ... SELECT
+        """
         if df.empty:
             logger.warning(f"⚠️ Empty dataframe, skipping save to {db_path}")
             return
         
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # Insert each row, using INSERT OR REPLACE to handle duplicates
-            inserted = 0
-            updated = 0
-            skipped = 0
-            
-            for _, row in df.iterrows():
-                # FILTER: Only allow market hours (9:15 AM - 3:30 PM)
-                dt_str = row['datetime']
-                try:
-                    dt = pd.to_datetime(dt_str)
-                    hour = dt.hour
-                    minute = dt.minute
-                    
-                    # Skip if before 9:15 AM or after 3:30 PM
-                    if hour < 9 or (hour == 9 and minute < 15):
-                        skipped += 1
-                        continue
-                    if hour > 15 or (hour == 15 and minute > 30):
-                        skipped += 1
-                        continue
-                except:
-                    pass  # If parsing fails, proceed anyway
-                
-                # Check if datetime already exists
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE datetime = ?", (row['datetime'],))
-                exists = cursor.fetchone()[0] > 0
-                
-                if exists:
-                    # Replace existing record
-                    cursor.execute(f"""
-                        REPLACE INTO {table_name} (datetime, open, high, low, close, volume)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (row['datetime'], row['open'], row['high'], row['low'], row['close'], row['volume']))
-                    updated += 1
+            # FILTER: Only allow market hours (9:15 AM - 3:30 PM), checked for all rows at once.
+            # Rows whose datetime doesn't parse are kept, as before. Minute of day straight
+            # from the datetime64[m] integers (minutes since epoch, naive local time), so the
+            # bounds check is two integer array comparisons rather than per-row time objects
+            dt = pd.to_datetime(df['datetime'], errors='coerce').to_numpy(dtype='datetime64[m]')
+            minute_of_day = dt.astype(np.int64) % 1440
+            in_market_hours = ((minute_of_day >= self.MARKET_OPEN_MINUTE) & (minute_of_day <= self.MARKET_CLOSE_MINUTE)) | np.isnat(dt)
+            skipped = int((~in_market_hours).sum())
+            
+            rows = df.loc[in_market_hours, ['datetime', 'open', 'high', 'low', 'close', 'volume']]
+            if pd.api.types.is_datetime64_any_dtype(rows['datetime']):
+                rows = rows.assign(datetime=rows['datetime'].astype(str))  # stored as text
+            
+            conn = self.get_connection(db_path)
+            
+            if bulk:
+                # Up to 500 rows per INSERT ... VALUES (...), (...) statement (to_sql commits
+                # on its own, so this happens before the write transaction below)
+                rows.to_sql(f'stage_{table_name}', conn, if_exists='replace', index=False,
+                            method='multi', chunksize=500)
+            
+            # One batched upsert in one write transaction: a candle already stored for the
+            # same datetime is updated in place, so there's no per-row existence check and
+            # no duplicate cleanup afterwards
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                if bulk:
+                    # WHERE true: without it SQLite would read ON CONFLICT as a join constraint
+                    conn.execute(candle_upsert(table_name, f"""
+                        SELECT datetime, open, high, low, close, volume FROM stage_{table_name} WHERE true
+                    """))
+                    conn.execute(f"DROP TABLE stage_{table_name}")
                 else:
-                    # Insert new record
-                    cursor.execute(f"""
-                        INSERT INTO {table_name} (datetime, open, high, low, close, volume)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (row['datetime'], row['open'], row['high'], row['low'], row['close'], row['volume']))
-                    inserted += 1
-            
-            conn.commit()
-            conn.close()
+                    conn.executemany(candle_upsert(table_name), rows.itertuples(index=False, name=None))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
             
             if skipped > 0:
-                logger.info(f"✅ Saved to {db_path}: {inserted} new, {updated} updated, {skipped} skipped (outside market hours)")
-            elif updated > 0:
-                logger.info(f"✅ Saved to {db_path}: {inserted} new, {updated} updated")
+                logger.info(f"✅ Saved to {db_path}: {len(rows)} rows, {skipped} skipped (outside market hours)")
             else:
-                logger.info(f"✅ Saved {len(df)} rows to {db_path}")
+                logger.info(f"✅ Saved {len(rows)} rows to {db_path}")
                 
         except Exception as e:
             logger.error(f"❌ Error saving to {db_path}: {e}")
@@ -186,12 +398,7 @@ class NiftyDataCollector:
                 interval=interval,
                 from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
                 to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                stock_code="NIFTY",
-                exchange_code="NSE",
-                product_type="cash",
-                expiry_date="",
-                right="",
-                strike_price=""
+                **NIFTY_CASH
             )
             
             if data and 'Success' in data:
@@ -209,7 +416,7 @@ class NiftyDataCollector:
                 
                 # Select and rename columns
                 if 'datetime' in df.columns:
-                    df = df[['datetime', 'open', 'high', 'low', 'close', 'volume']]
+                    df = candle_columns(df)
                 else:
                     logger.error(f"❌ Missing datetime column in response")
                     return pd.DataFrame()
@@ -224,26 +431,17 @@ class NiftyDataCollector:
             return pd.DataFrame()
     
     def aggregate_5min_to_15min(self, df_5min):
-        """Aggregate 5-minute data to 15-minute candles"""
+        """Aggregate 5-minute data to 15-minute candles (returned indexed by datetime)"""
         if df_5min.empty:
             return pd.DataFrame()
         
         try:
-            df = df_5min.copy()
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df = df.set_index('datetime')
+            # Index by the parsed datetimes and keep just the OHLCV columns - no copy of
+            # the caller's frame just to mutate it
+            df = df_5min.set_index(pd.to_datetime(df_5min['datetime']))[list(OHLCV_AGG)]
             
             # Resample to 15-minute intervals
-            df_15min = df.resample('15T').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-            
-            df_15min = df_15min.reset_index()
-            df_15min['datetime'] = df_15min['datetime'].astype(str)
+            df_15min = df.resample('15min').agg(OHLCV_AGG).dropna()
             
             logger.info(f"✅ Aggregated {len(df_5min)} → {len(df_15min)} (5min → 15min)")
             return df_15min
@@ -253,26 +451,22 @@ class NiftyDataCollector:
             return pd.DataFrame()
     
     def aggregate_15min_to_1hour(self, df_15min):
-        """Aggregate 15-minute data to 1-hour candles"""
+        """
+        Aggregate 15-minute data to 1-hour candles (returned indexed by datetime).
+        Takes the datetime-indexed output of aggregate_5min_to_15min as is, so the
+        two stages don't go through datetime text in between
+        """
         if df_15min.empty:
             return pd.DataFrame()
         
         try:
-            df = df_15min.copy()
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df = df.set_index('datetime')
-            
-            # Resample to 1-hour intervals
-            df_1hour = df.resample('1H').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-            
-            df_1hour = df_1hour.reset_index()
-            df_1hour['datetime'] = df_1hour['datetime'].astype(str)
+            if isinstance(df_15min.index, pd.DatetimeIndex):
+                df = df_15min
+            else:
+                df = df_15min.set_index(pd.to_datetime(df_15min['datetime']))[list(OHLCV_AGG)]
+            
+            # Resample to 1-hour intervals (each one exactly four 15-min bins)
+            df_1hour = df.resample('1h').agg(OHLCV_AGG).dropna()
             
             logger.info(f"✅ Aggregated {len(df_15min)} → {len(df_1hour)} (15min → 1hour)")
             return df_1hour
@@ -281,7 +475,61 @@ class NiftyDataCollector:
             logger.error(f"❌ Error aggregating to 1hour: {e}")
             return pd.DataFrame()
     
-    def download_last_n_days_data(self, days=10):
+    async def _download_batches(self, interval, today, days, batch_days):
+        """
+        Download the last `days` of `interval` candles in batch_days-long windows.
+        Each request runs on the Breeze pool, up to HISTORICAL_CONCURRENCY at once,
+        with starts spaced HISTORICAL_REQUEST_SPACING apart to stay inside the API
+        rate limit. Returns the non-empty batches as DataFrames, in batch order
+        """
+        num_batches = (days + batch_days - 1) // batch_days
+        semaphore = asyncio.Semaphore(HISTORICAL_CONCURRENCY)
+        next_start = time_module.monotonic()
+        
+        async def fetch(batch_num):
+            nonlocal next_start
+            batch_end_days = batch_num * batch_days
+            batch_start_days = min((batch_num + 1) * batch_days, days)
+            
+            from_date = today - timedelta(days=batch_start_days)
+            to_date = today - timedelta(days=batch_end_days)
+            
+            from_datetime = datetime.combine(from_date, self.MARKET_OPEN)
+            to_datetime = datetime.combine(to_date, self.MARKET_CLOSE)
+            
+            async with semaphore:
+                # Claim the next start slot, then wait for it
+                now = time_module.monotonic()
+                start_at = max(now, next_start)
+                next_start = start_at + HISTORICAL_REQUEST_SPACING
+                await asyncio.sleep(start_at - now)
+                
+                logger.info(f"📦 Batch {batch_num + 1}/{num_batches}: {from_date} to {to_date}")
+                
+                try:
+                    data = await self.call_breeze(
+                        self.breeze.get_historical_data_v2,
+                        interval=interval,
+                        from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        **NIFTY_CASH
+                    )
+                except Exception as e:
+                    logger.error(f"   ❌ Error: {e}")
+                    return None
+            
+            if data and 'Success' in data and len(data['Success']) > 0:
+                df_batch = pd.DataFrame(data['Success'])
+                if 'datetime' in df_batch.columns:
+                    df_batch = candle_columns(df_batch)
+                    logger.info(f"   ✅ Downloaded {len(df_batch)} candles")
+                    return df_batch
+            return None
+        
+        batches = await asyncio.gather(*(fetch(batch_num) for batch_num in range(num_batches)))
+        return [df_batch for df_batch in batches if df_batch is not None]
+    
+    async def download_last_n_days_data(self, days=10):
         """Download last N days of data in batches for all timeframes"""
         try:
             today = datetime.now().date()
@@ -299,12 +547,8 @@ class NiftyDataCollector:
                     (self.db_1hour, 'data_1hour'),
                     (self.db_1day, 'data_1day')
                 ]:
-                    conn = sqlite3.connect(db_path)
-                    cursor = conn.cursor()
-                    cursor.execute(f"DELETE FROM {table_name}")
-                    conn.commit()
+                    cursor = self.get_connection(db_path).execute(f"DELETE FROM {table_name}")
                     count = cursor.rowcount
-                    conn.close()
                     logger.info(f"✅ Cleared {table_name}: {count} records deleted")
             
             # =====================================================================
@@ -315,62 +559,20 @@ class NiftyDataCollector:
             logger.info(f"{'='*80}\n")
             
             batch_days = 17  # Days per batch for 5-min data
-            num_batches = (days + batch_days - 1) // batch_days
-            
-            all_5min_data = []
-            
-            for batch_num in range(num_batches):
-                batch_end_days = batch_num * batch_days
-                batch_start_days = min((batch_num + 1) * batch_days, days)
-                
-                from_date = today - timedelta(days=batch_start_days)
-                to_date = today - timedelta(days=batch_end_days)
-                
-                from_datetime = datetime.combine(from_date, time(9, 15))
-                to_datetime = datetime.combine(to_date, time(15, 30))
-                
-                logger.info(f"📦 Batch {batch_num + 1}/{num_batches}: {from_date} to {to_date}")
-                
-                try:
-                    data_5min = self.breeze.get_historical_data_v2(
-                        interval="5minute",
-                        from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                        to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                        stock_code="NIFTY",
-                        exchange_code="NSE",
-                        product_type="cash",
-                        expiry_date="",
-                        right="",
-                        strike_price=""
-                    )
-                    
-                    if data_5min and 'Success' in data_5min and len(data_5min['Success']) > 0:
-                        df_batch = pd.DataFrame(data_5min['Success'])
-                        if 'datetime' in df_batch.columns:
-                            df_batch = df_batch[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-                            logger.info(f"   ✅ Downloaded {len(df_batch)} candles")
-                            all_5min_data.append(df_batch)
-                    
-                    time_module.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"   ❌ Error: {e}")
+            all_5min_data = await self._download_batches("5minute", today, days, batch_days)
             
             # Save 5-min data
             if all_5min_data:
-                df_5min = pd.concat(all_5min_data, ignore_index=True)
-                df_5min['datetime'] = pd.to_datetime(df_5min['datetime'])
-                df_5min = df_5min.drop_duplicates(subset=['datetime']).sort_values('datetime')
-                df_5min['datetime'] = df_5min['datetime'].astype(str)
+                df_5min = combine_batches(all_5min_data)
                 
                 logger.info(f"\n✅ Total 5-min candles: {len(df_5min)}")
-                self.save_to_database(df_5min, self.db_5min, 'data_5min')
+                self.save_to_database(df_5min, self.db_5min, 'data_5min', bulk=True)
                 
                 # Aggregate to 15-min
                 df_15min = self.aggregate_5min_to_15min(df_5min)
                 if not df_15min.empty:
                     logger.info(f"✅ Aggregated to {len(df_15min)} 15-min candles")
-                    self.save_to_database(df_15min, self.db_15min, 'data_15min')
+                    self.save_to_database(text_datetime(df_15min), self.db_15min, 'data_15min', bulk=True)
             
             # =====================================================================
             # DOWNLOAD 1-HOUR DATA DIRECTLY FROM API
@@ -381,56 +583,14 @@ class NiftyDataCollector:
             
             # 1-hour: 1000 candles = ~167 days (6 hours per day)
             hour_batch_days = 167
-            hour_num_batches = (days + hour_batch_days - 1) // hour_batch_days
-            
-            all_1hour_data = []
-            
-            for batch_num in range(hour_num_batches):
-                batch_end_days = batch_num * hour_batch_days
-                batch_start_days = min((batch_num + 1) * hour_batch_days, days)
-                
-                from_date = today - timedelta(days=batch_start_days)
-                to_date = today - timedelta(days=batch_end_days)
-                
-                from_datetime = datetime.combine(from_date, time(9, 15))
-                to_datetime = datetime.combine(to_date, time(15, 30))
-                
-                logger.info(f"📦 Batch {batch_num + 1}/{hour_num_batches}: {from_date} to {to_date}")
-                
-                try:
-                    data_1hour = self.breeze.get_historical_data_v2(
-                        interval="1hour",
-                        from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                        to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                        stock_code="NIFTY",
-                        exchange_code="NSE",
-                        product_type="cash",
-                        expiry_date="",
-                        right="",
-                        strike_price=""
-                    )
-                    
-                    if data_1hour and 'Success' in data_1hour and len(data_1hour['Success']) > 0:
-                        df_batch = pd.DataFrame(data_1hour['Success'])
-                        if 'datetime' in df_batch.columns:
-                            df_batch = df_batch[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-                            logger.info(f"   ✅ Downloaded {len(df_batch)} candles")
-                            all_1hour_data.append(df_batch)
-                    
-                    time_module.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"   ❌ Error: {e}")
+            all_1hour_data = await self._download_batches("1hour", today, days, hour_batch_days)
             
             # Save 1-hour data
             if all_1hour_data:
-                df_1hour = pd.concat(all_1hour_data, ignore_index=True)
-                df_1hour['datetime'] = pd.to_datetime(df_1hour['datetime'])
-                df_1hour = df_1hour.drop_duplicates(subset=['datetime']).sort_values('datetime')
-                df_1hour['datetime'] = df_1hour['datetime'].astype(str)
+                df_1hour = combine_batches(all_1hour_data)
                 
                 logger.info(f"\n✅ Total 1-hour candles: {len(df_1hour)}")
-                self.save_to_database(df_1hour, self.db_1hour, 'data_1hour')
+                self.save_to_database(df_1hour, self.db_1hour, 'data_1hour', bulk=True)
             
             # =====================================================================
             # DOWNLOAD 1-DAY DATA DIRECTLY FROM API
@@ -443,31 +603,24 @@ class NiftyDataCollector:
             from_date = today - timedelta(days=days)
             to_date = today
             
-            from_datetime = datetime.combine(from_date, time(9, 15))
-            to_datetime = datetime.combine(to_date, time(15, 30))
+            from_datetime = datetime.combine(from_date, self.MARKET_OPEN)
+            to_datetime = datetime.combine(to_date, self.MARKET_CLOSE)
             
             logger.info(f"� Single batch: {from_date} to {to_date}")
             
             try:
-                data_1day = self.breeze.get_historical_data_v2(
+                data_1day = await self.call_breeze(
+                    self.breeze.get_historical_data_v2,
                     interval="1day",
                     from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
                     to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                    stock_code="NIFTY",
-                    exchange_code="NSE",
-                    product_type="cash",
-                    expiry_date="",
-                    right="",
-                    strike_price=""
+                    **NIFTY_CASH
                 )
                 
                 if data_1day and 'Success' in data_1day and len(data_1day['Success']) > 0:
                     df_1day = pd.DataFrame(data_1day['Success'])
                     if 'datetime' in df_1day.columns:
-                        df_1day = df_1day[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-                        df_1day['datetime'] = pd.to_datetime(df_1day['datetime'])
-                        df_1day = df_1day.drop_duplicates(subset=['datetime']).sort_values('datetime')
-                        df_1day['datetime'] = df_1day['datetime'].astype(str)
+                        df_1day = combine_batches([candle_columns(df_1day)])
                         
                         logger.info(f"   ✅ Downloaded {len(df_1day)} candles")
                         self.save_to_database(df_1day, self.db_1day, 'data_1day')
@@ -491,7 +644,7 @@ class NiftyDataCollector:
             current_time = datetime.now()
             
             # Start from 9:15 AM today
-            from_datetime = datetime.combine(today, time(9, 15))
+            from_datetime = datetime.combine(today, self.MARKET_OPEN)
             
             # If current time is before 9:15 AM, no data to download
             if current_time < from_datetime:
@@ -508,19 +661,14 @@ class NiftyDataCollector:
                 interval="1minute",
                 from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
                 to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                stock_code="NIFTY",
-                exchange_code="NSE",
-                product_type="cash",
-                expiry_date="",
-                right="",
-                strike_price=""
+                **NIFTY_CASH
             )
             
             df_1min = pd.DataFrame()
             if data_1min and 'Success' in data_1min and len(data_1min['Success']) > 0:
                 df_1min = pd.DataFrame(data_1min['Success'])
                 if 'datetime' in df_1min.columns:
-                    df_1min = df_1min[['datetime', 'open', 'high', 'low', 'close', 'volume']]
+                    df_1min = candle_columns(df_1min)
                     logger.info(f"✅ Downloaded {len(df_1min)} 1-minute candles for today")
             
             # Download 5-minute data
@@ -529,19 +677,14 @@ class NiftyDataCollector:
                 interval="5minute",
                 from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
                 to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                stock_code="NIFTY",
-                exchange_code="NSE",
-                product_type="cash",
-                expiry_date="",
-                right="",
-                strike_price=""
+                **NIFTY_CASH
             )
             
             df_5min = pd.DataFrame()
             if data_5min and 'Success' in data_5min and len(data_5min['Success']) > 0:
                 df_5min = pd.DataFrame(data_5min['Success'])
                 if 'datetime' in df_5min.columns:
-                    df_5min = df_5min[['datetime', 'open', 'high', 'low', 'close', 'volume']]
+                    df_5min = candle_columns(df_5min)
                     logger.info(f"✅ Downloaded {len(df_5min)} 5-minute candles for today")
             
             return df_1min, df_5min
@@ -556,17 +699,8 @@ class NiftyDataCollector:
             return pd.DataFrame()
         
         try:
-            df = df_1min.copy()
-            
             # Create daily candle from all 1-minute candles
-            daily_candle = {
-                'datetime': date_str,
-                'open': df['open'].iloc[0],
-                'high': df['high'].max(),
-                'low': df['low'].min(),
-                'close': df['close'].iloc[-1],
-                'volume': df['volume'].sum()
-            }
+            daily_candle = ohlcv_candle(df_1min, date_str)
             
             df_daily = pd.DataFrame([daily_candle])
             
@@ -605,13 +739,13 @@ class NiftyDataCollector:
             logger.info("\n📊 Step 4: Aggregating 5-min → 15-min...")
             df_15min = self.aggregate_5min_to_15min(df_5min)
             if not df_15min.empty:
-                self.save_to_database(df_15min, self.db_15min, 'data_15min')
+                self.save_to_database(text_datetime(df_15min), self.db_15min, 'data_15min')
                 
                 # Aggregate to 1-hour
                 logger.info("\n📊 Step 5: Aggregating 15-min → 1-hour...")
                 df_1hour = self.aggregate_15min_to_1hour(df_15min)
                 if not df_1hour.empty:
-                    self.save_to_database(df_1hour, self.db_1hour, 'data_1hour')
+                    self.save_to_database(text_datetime(df_1hour), self.db_1hour, 'data_1hour')
         
         logger.info(f"\n{'='*80}")
         logger.info(f"✅ HISTORICAL DATA DOWNLOAD COMPLETE")
@@ -621,12 +755,7 @@ class NiftyDataCollector:
         """Get live quote for NIFTY"""
         try:
             quote = self.breeze.get_quotes(
-                stock_code="NIFTY",
-                exchange_code="NSE",
-                expiry_date="",
-                product_type="cash",
-                right="",
-                strike_price=""
+                **NIFTY_CASH
             )
             
             if quote and 'Success' in quote:
@@ -638,7 +767,11 @@ class NiftyDataCollector:
             return None
     
     def create_1min_candle_from_quote(self, quote, timestamp):
-        """Create a 1-minute OHLC candle from quote data"""
+        """
+        Create a 1-minute OHLC candle from quote data. Returns a plain dict - the
+        shape aggregate_buffer_to_timeframe buffers - rather than a one-row
+        DataFrame per tick; wrap a batch of them in one DataFrame to save
+        """
         try:
             price = float(quote.get('ltp', 0))
             
@@ -653,38 +786,52 @@ class NiftyDataCollector:
                 'volume': int(quote.get('volume', 0))
             }
             
-            return pd.DataFrame([candle])
+            return candle
             
         except Exception as e:
             logger.error(f"❌ Error creating candle: {e}")
-            return pd.DataFrame()
+            return None
     
-    def clean_duplicates_for_datetime(self, db_file, table_name, datetime_value):
-        """Remove duplicates for a specific datetime, keeping only the first entry"""
+    def save_candle(self, db_path, table_name, candle):
+        """
+        Upsert one aggregated candle row. The live aggregators use this rather than
+        save_to_database: no one-row DataFrame, and their candles are built from rows
+        that already passed its market-hours filter
+        """
         try:
-            conn = sqlite3.connect(db_file)
-            cursor = conn.cursor()
-            
-            # Delete duplicates, keep only the first (MIN rowid)
-            cursor.execute(f"""
-                DELETE FROM {table_name}
-                WHERE datetime = ?
-                AND rowid NOT IN (
-                    SELECT MIN(rowid)
-                    FROM {table_name}
-                    WHERE datetime = ?
-                )
-            """, (datetime_value, datetime_value))
-            
-            deleted = cursor.rowcount
-            conn.commit()
-            conn.close()
-            
-            if deleted > 0:
-                logger.info(f"🧹 Cleaned {deleted} duplicate(s) for {datetime_value}")
-                
+            self.get_connection(db_path).execute(candle_upsert(table_name), candle)  # autocommit
         except Exception as e:
-            logger.error(f"❌ Error cleaning duplicates: {e}")
+            logger.error(f"❌ Error saving to {db_path}: {e}")
+    
+    def dedupe_table(self, db_path, table_name):
+        """
+        Remove duplicate datetimes, keeping the first entry (MIN rowid) of each, in one
+        GROUP BY pass. Only tables without a unique datetime (e.g. written by pandas
+        to_sql) can hold duplicates; create_database_tables runs this before adding one
+        """
+        conn = self.get_connection(db_path)
+        
+        # Usually there are none: find the first duplicate (a read that stops early, along
+        # idx_datetime when present) before paying for the DELETE and its NOT IN set
+        has_duplicates = conn.execute(f"""
+            SELECT 1 FROM {table_name} GROUP BY datetime HAVING COUNT(*) > 1 LIMIT 1
+        """).fetchone()
+        if has_duplicates is None:
+            return 0
+        
+        cursor = conn.execute(f"""
+            DELETE FROM {table_name}
+            WHERE rowid NOT IN (
+                SELECT MIN(rowid)
+                FROM {table_name}
+                GROUP BY datetime
+            )
+        """)
+        
+        deleted = cursor.rowcount
+        if deleted > 0:
+            logger.info(f"🧹 Cleaned {deleted} duplicate(s) from {table_name}")
+        return deleted
     
     def aggregate_buffer_to_timeframe(self, buffer, minutes):
         """Aggregate buffer data to specific timeframe"""
@@ -692,19 +839,19 @@ class NiftyDataCollector:
             return None
         
         try:
-            df = pd.DataFrame(buffer[-minutes:])
+            # The buffer holds a handful of candle dicts: reduce them in plain Python
+            # rather than building a DataFrame just to take max/min/sum
+            window = buffer[-minutes:]
             
             # Use FIRST candle's timestamp as the aggregated candle timestamp
             # This represents the START of the period
-            candle_timestamp = df['datetime'].iloc[0]
-            
             candle = {
-                'datetime': candle_timestamp,
-                'open': df['open'].iloc[0],
-                'high': df['high'].max(),
-                'low': df['low'].min(),
-                'close': df['close'].iloc[-1],
-                'volume': df['volume'].sum()
+                'datetime': window[0]['datetime'],
+                'open': window[0]['open'],
+                'high': max(row['high'] for row in window),
+                'low': min(row['low'] for row in window),
+                'close': window[-1]['close'],
+                'volume': sum(row['volume'] for row in window)
             }
             
             return pd.DataFrame([candle])
@@ -713,6 +860,26 @@ class NiftyDataCollector:
             logger.error(f"❌ Error aggregating buffer: {e}")
             return None
     
+    def recent_window(self, recent, db_path, table_name, start, end, needed):
+        """
+        window_candle over start..end, folded from the in-memory recent rows when they
+        hold all `needed` candles of the window - else read from the database (e.g.
+        right after startup, when the earlier candles came from the download)
+        """
+        window = {row[0]: row for row in recent if start <= row[0] <= end}  # a re-saved candle wins
+        if len(window) < needed:
+            return window_candle(self.get_connection(db_path), table_name, start, end)
+        
+        rows = [window[dt] for dt in sorted(window)]
+        return len(rows), (
+            start,
+            rows[0][1],
+            max(row[2] for row in rows),
+            min(row[3] for row in rows),
+            rows[-1][4],
+            sum(row[5] for row in rows)
+        )
+    
     def aggregate_recent_1min_to_5min(self, current_time):
         """Aggregate last 5 minutes of 1-min data to 5-min candle"""
         try:
@@ -720,30 +887,17 @@ class NiftyDataCollector:
             # The candle is labeled with the start time (9:25)
             end_time = current_time - timedelta(minutes=1)  # Up to previous minute
             start_time = current_time - timedelta(minutes=5)
+            start_s = start_time.strftime('%Y-%m-%d %H:%M:%S')  # formatted once, sliced for the logs
+            end_s = end_time.strftime('%Y-%m-%d %H:%M:%S')
             
-            # Fetch 5 minutes of 1-min data
-            conn = sqlite3.connect(self.db_1min)
-            query = f"SELECT * FROM data_1min WHERE datetime >= ? AND datetime <= ? ORDER BY datetime"
-            df = pd.read_sql_query(query, conn, params=(start_time.strftime('%Y-%m-%d %H:%M:%S'), 
-                                                         end_time.strftime('%Y-%m-%d %H:%M:%S')))
-            conn.close()
+            # Aggregate 5 minutes of 1-min data
+            count, candle = window_candle(self.get_connection(self.db_1min), 'data_1min', start_s, end_s)
             
-            if len(df) == 0:
+            if count == 0:
                 return
             
-            # Create 5-min candle with timestamp = start of period
-            candle = {
-                'datetime': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'open': df['open'].iloc[0],
-                'high': df['high'].max(),
-                'low': df['low'].min(),
-                'close': df['close'].iloc[-1],
-                'volume': df['volume'].sum()
-            }
-            
-            df_5min = pd.DataFrame([candle])
-            self.save_to_database(df_5min, self.db_5min, 'data_5min')
-            logger.info(f"📊 5-min candle: {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
+            self.save_candle(self.db_5min, 'data_5min', candle)
+            logger.info(f"📊 5-min candle: {start_s[11:16]}-{end_s[11:16]}")
             
         except Exception as e:
             logger.error(f"❌ Error aggregating 1min→5min: {e}")
@@ -758,37 +912,22 @@ class NiftyDataCollector:
             
             end_time = current_time - timedelta(minutes=1)  # Up to previous minute (12:29 at 12:30)
             start_time = current_time - timedelta(minutes=15)  # Start 15 min ago (12:15 at 12:30)
+            start_s = start_time.strftime('%Y-%m-%d %H:%M:%S')
+            end_s = end_time.strftime('%Y-%m-%d %H:%M:%S')
             
-            # Fetch 15 minutes of 5-min data (should be 3 candles: 12:15, 12:20, 12:25)
-            conn = sqlite3.connect(self.db_5min)
-            query = f"SELECT * FROM data_5min WHERE datetime >= ? AND datetime <= ? ORDER BY datetime"
-            df = pd.read_sql_query(query, conn, params=(start_time.strftime('%Y-%m-%d %H:%M:%S'), 
-                                                         end_time.strftime('%Y-%m-%d %H:%M:%S')))
-            conn.close()
+            # Aggregate 15 minutes of 5-min data (should be 3 candles: 12:15, 12:20, 12:25)
+            count, candle = self.recent_window(self._recent_5min, self.db_5min, 'data_5min', start_s, end_s, 3)
             
-            logger.info(f"🔍 Looking for 5-min data from {start_time.strftime('%H:%M')} to {end_time.strftime('%H:%M')}")
-            logger.info(f"📊 Found {len(df)} 5-min candles for 15-min aggregation")
+            logger.info(f"🔍 Looking for 5-min data from {start_s[11:16]} to {end_s[11:16]}")
+            logger.info(f"📊 Found {count} 5-min candles for 15-min aggregation")
             
-            if len(df) < 3:  # Need at least 3 x 5-min candles
-                logger.warning(f"⚠️ Only {len(df)} 5-min candles, need 3 for 15-min. Skipping aggregation.")
+            if count < 3:  # Need at least 3 x 5-min candles
+                logger.warning(f"⚠️ Only {count} 5-min candles, need 3 for 15-min. Skipping aggregation.")
                 return
             
-            # Create 15-min candle with timestamp = start of period
-            candle = {
-                'datetime': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'open': df['open'].iloc[0],
-                'high': df['high'].max(),
-                'low': df['low'].min(),
-                'close': df['close'].iloc[-1],
-                'volume': df['volume'].sum()
-            }
-            
-            df_15min = pd.DataFrame([candle])
-            self.save_to_database(df_15min, self.db_15min, 'data_15min')
-            logger.info(f"📈 15-min candle: {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
-            
-            # Clean duplicates after aggregation
-            self.clean_duplicates_for_datetime(self.db_15min, 'data_15min', start_time.strftime('%Y-%m-%d %H:%M:%S'))
+            self.save_candle(self.db_15min, 'data_15min', candle)
+            self._recent_15min.append(candle)
+            logger.info(f"📈 15-min candle: {start_s[11:16]}-{end_s[11:16]}")
             
         except Exception as e:
             logger.error(f"❌ Error aggregating 5min→15min: {e}")
@@ -808,35 +947,74 @@ class NiftyDataCollector:
             # Start time is exactly 1 hour before (e.g., 10:15 -> 9:15)
             start_time = current_time - timedelta(hours=1)
             end_time = current_time - timedelta(minutes=1)  # Up to X:14
+            start_s = start_time.strftime('%Y-%m-%d %H:%M:%S')
+            end_s = end_time.strftime('%Y-%m-%d %H:%M:%S')
             
-            # Fetch 60 minutes of 15-min data (should be 4 candles: X:15, X:30, X:45, X:00)
-            conn = sqlite3.connect(self.db_15min)
-            query = f"SELECT * FROM data_15min WHERE datetime >= ? AND datetime <= ? ORDER BY datetime"
-            df = pd.read_sql_query(query, conn, params=(start_time.strftime('%Y-%m-%d %H:%M:%S'), 
-                                                         end_time.strftime('%Y-%m-%d %H:%M:%S')))
-            conn.close()
+            # Aggregate 60 minutes of 15-min data (should be 4 candles: X:15, X:30, X:45, X:00)
+            count, candle = self.recent_window(self._recent_15min, self.db_15min, 'data_15min', start_s, end_s, 4)
             
-            if len(df) < 4:  # Need at least 4 x 15-min candles
-                logger.debug(f"⚠️ Only {len(df)} 15-min candles for {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}, need 4 for 1-hour")
+            if count < 4:  # Need at least 4 x 15-min candles
+                logger.debug(f"⚠️ Only {count} 15-min candles for {start_s[11:16]}-{end_s[11:16]}, need 4 for 1-hour")
                 return
             
-            # Create 1-hour candle with timestamp = start time (e.g., 9:15 for 9:15-10:14 period)
-            candle = {
-                'datetime': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'open': df['open'].iloc[0],
-                'high': df['high'].max(),
-                'low': df['low'].min(),
-                'close': df['close'].iloc[-1],
-                'volume': df['volume'].sum()
-            }
-            
-            df_1hour = pd.DataFrame([candle])
-            self.save_to_database(df_1hour, self.db_1hour, 'data_1hour')
-            logger.info(f"🕐 1-hour candle: {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
+            self.save_candle(self.db_1hour, 'data_1hour', candle)
+            logger.info(f"🕐 1-hour candle: {start_s[11:16]}-{end_s[11:16]}")
             
         except Exception as e:
             logger.error(f"❌ Error aggregating 15min→1hour: {e}")
     
+    def _writer_loop(self):
+        """Run queued database writes one at a time, in the order they were queued"""
+        while True:
+            job = self._write_q.get()
+            if job is None:
+                break
+            func, args = job
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"❌ Error in database writer: {e}")
+    
+    def queue_write(self, func, *args):
+        """
+        Hand func(*args) to the writer thread (started on first use) and return at once,
+        so disk writes don't stall the live feed. A single writer keeps writes ordered:
+        an aggregation queued after a save sees the saved candle
+        """
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+            self._writer.start()
+        self._write_q.put((func, args))
+    
+    def store_live_candle(self, candle, current_5min):
+        """Save a live 5-min candle row, then build the 15-min / 1-hour candles it completes"""
+        current_minute = current_5min.minute
+        
+        # Save to 5-min database
+        self.save_candle(self.db_5min, 'data_5min', candle)  # replaces a same-time candle
+        self._recent_5min.append(candle)
+        
+        # Aggregate to 15-min at 15-minute boundaries (X:00, X:15, X:30, X:45)
+        # At 9:30:30, aggregate 9:15, 9:20, 9:25 → create 9:15 15-min candle
+        if current_minute in [0, 15, 30, 45]:
+            logger.info(f"📊 Aggregating to 15-minute...")
+            self.aggregate_recent_5min_to_15min(current_5min)
+            
+            # Aggregate to 1-hour at hour boundaries (X:15)
+            if current_minute == 15:
+                logger.info(f"🕐 Aggregating to 1-hour...")
+                self.aggregate_recent_15min_to_1hour(current_5min)
+    
+    def next_live_tick(self, now):
+        """
+        When the live feed fetches next: the next 5-minute boundary + 3 seconds. A tick
+        whose second is still running (e.g. 9:15:03.4) is still due
+        """
+        tick = now.replace(minute=now.minute - now.minute % 5, second=3, microsecond=0)
+        if now >= tick + timedelta(seconds=1):
+            tick += timedelta(minutes=5)
+        return tick
+    
     async def start_live_feed(self):
         """Start live data feed - fetches 5-min candles with 5-second delay"""
         logger.info(f"\n{'='*80}")
@@ -847,94 +1025,67 @@ class NiftyDataCollector:
         
         while True:
             try:
+                # Next 5-minute boundary + 3 seconds for real-time trading
+                # e.g., 9:15:03, 9:20:03, 9:25:03, etc.
                 now = datetime.now()
+                tick = self.next_live_tick(now)
                 
                 # Check if it's market hours (9:15 AM to 3:30 PM)
-                market_open = time(9, 15)
-                market_close = time(15, 30)
-                current_time = now.time()
-                
-                if not (market_open <= current_time <= market_close):
+                if not (self.MARKET_OPEN <= tick.time() <= self.MARKET_CLOSE):
                     await asyncio.sleep(60)  # Check every minute outside market hours
                     continue
                 
-                # Check if we're at a 5-minute boundary + 3 seconds for real-time trading
-                # e.g., 9:15:03, 9:20:03, 9:25:03, etc.
-                current_minute = now.minute
-                current_second = now.second
+                # Sleep straight through to the boundary: one wakeup per candle instead of
+                # a check every second
+                await asyncio.sleep((tick - now).total_seconds())
                 
-                # 5-minute boundaries: 15, 20, 25, 30, 35, 40, 45, 50, 55, 00, 05, 10
-                is_5min_boundary = (current_minute % 5 == 0) and (current_second == 3)
+                # Round to the 5-minute mark (remove the 3 seconds)
+                current_5min = tick.replace(second=0)
                 
-                if is_5min_boundary:
-                    # Round to the 5-minute mark (remove the 3 seconds)
-                    current_5min = now.replace(second=0, microsecond=0)
-                    
-                    # Avoid duplicate processing
-                    if current_5min == last_5min:
-                        await asyncio.sleep(1)
-                        continue
-                    
-                    last_5min = current_5min
-                    
-                    logger.info(f"\n⏰ {current_5min.strftime('%Y-%m-%d %H:%M:%S')}")
-                    logger.info(f"⏱️  Fetching 5-min candle (3-second delay for real-time trading)...")
-                    
-                    # The candle we want is the CURRENT completed 5-minute period
-                    # At 14:15:03, we want the 14:15 candle that just completed
-                    candle_time = current_5min
-                    
-                    # Download the just-completed 5-minute candle from API
-                    from_datetime = candle_time
-                    to_datetime = current_5min + timedelta(minutes=5) - timedelta(seconds=1)  # Up to end of candle
-                    
-                    try:
-                        data = self.breeze.get_historical_data_v2(
-                            interval="5minute",
-                            from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                            to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-                            stock_code="NIFTY",
-                            exchange_code="NSE",
-                            product_type="cash",
-                            expiry_date="",
-                            right="",
-                            strike_price=""
-                        )
-                        
-                        if data and 'Success' in data and len(data['Success']) > 0:
-                            df_5min = pd.DataFrame(data['Success'])
-                            if 'datetime' in df_5min.columns:
-                                df_5min = df_5min[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-                                # Take only the last candle (most recent)
-                                df_5min = df_5min.tail(1)
-                                
-                                logger.info(f"✅ Fetched 5-min candle for {candle_time.strftime('%H:%M')}")
-                                logger.info(f"   O:{df_5min['open'].iloc[0]:.2f} H:{df_5min['high'].iloc[0]:.2f} L:{df_5min['low'].iloc[0]:.2f} C:{df_5min['close'].iloc[0]:.2f}")
-                                
-                                # Save to 5-min database
-                                self.save_to_database(df_5min, self.db_5min, 'data_5min')
-                                
-                                # Clean duplicates for this specific candle
-                                self.clean_duplicates_for_datetime(self.db_5min, 'data_5min', candle_time.strftime('%Y-%m-%d %H:%M:%S'))
-                                
-                                # Aggregate to 15-min at 15-minute boundaries (X:00, X:15, X:30, X:45)
-                                # At 9:30:30, aggregate 9:15, 9:20, 9:25 → create 9:15 15-min candle
-                                if current_minute in [0, 15, 30, 45]:
-                                    logger.info(f"📊 Aggregating to 15-minute...")
-                                    self.aggregate_recent_5min_to_15min(current_5min)
-                                    
-                                    # Aggregate to 1-hour at hour boundaries (X:15)
-                                    if current_minute == 15:
-                                        logger.info(f"🕐 Aggregating to 1-hour...")
-                                        self.aggregate_recent_15min_to_1hour(current_5min)
-                        else:
-                            logger.warning(f"⚠️ No data returned for {candle_time.strftime('%H:%M')}")
+                # Avoid duplicate processing
+                if current_5min == last_5min:
+                    await asyncio.sleep(1)
+                    continue
+                
+                last_5min = current_5min
+                
+                logger.info(f"\n⏰ {current_5min.strftime('%Y-%m-%d %H:%M:%S')}")
+                logger.info(f"⏱️  Fetching 5-min candle (3-second delay for real-time trading)...")
+                
+                # The candle we want is the CURRENT completed 5-minute period
+                # At 14:15:03, we want the 14:15 candle that just completed
+                candle_time = current_5min
+                
+                # Download the just-completed 5-minute candle from API
+                from_datetime = candle_time
+                to_datetime = current_5min + timedelta(minutes=5) - timedelta(seconds=1)  # Up to end of candle
+                
+                try:
+                    # Blocking HTTPS call: run it on the Breeze pool so the event loop stays free
+                    data = await self.call_breeze(
+                        self.breeze.get_historical_data_v2,
+                        interval="5minute",
+                        from_date=from_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        to_date=to_datetime.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                        **NIFTY_CASH
+                    )
                     
-                    except Exception as e:
-                        logger.error(f"❌ Error fetching 5-min data: {e}")
+                    if data and 'Success' in data and len(data['Success']) > 0:
+                        # Take only the last candle (most recent) - no DataFrame for one row
+                        record = data['Success'][-1]
+                        if 'datetime' in record:
+                            candle = candle_row(record)
+                            
+                            logger.info(f"✅ Fetched 5-min candle for {candle_time.strftime('%H:%M')}")
+                            logger.info(f"   O:{candle[1]:.2f} H:{candle[2]:.2f} L:{candle[3]:.2f} C:{candle[4]:.2f}")
+                            
+                            # Save + 15-min/1-hour aggregation on the writer thread
+                            self.queue_write(self.store_live_candle, candle, current_5min)
+                    else:
+                        logger.warning(f"⚠️ No data returned for {candle_time.strftime('%H:%M')}")
                 
-                # Sleep until next second
-                await asyncio.sleep(1)
+                except Exception as e:
+                    logger.error(f"❌ Error fetching 5-min data: {e}")
                 
             except Exception as e:
                 logger.error(f"❌ Error in live feed: {e}")
@@ -955,18 +1106,16 @@ class NiftyDataCollector:
         self.create_database_tables()
         
         # Check if we have recent data (data from today)
-        conn = sqlite3.connect(self.db_5min)
-        cursor = conn.cursor()
+        cursor = self.get_connection(self.db_5min).cursor()
         cursor.execute("SELECT COUNT(*) FROM data_5min WHERE date(datetime) = date('now', 'localtime')")
         today_count = cursor.fetchone()[0]
-        conn.close()
         
         # Only download if explicitly requested AND we don't have today's data
         if download_last_n_days > 0 and today_count == 0:
             logger.info(f"\n{'='*60}")
             logger.info(f"STEP 1: Downloading Last {download_last_n_days} Days Historical Data")
             logger.info(f"{'='*60}\n")
-            self.download_last_n_days_data(days=download_last_n_days)
+            await self.download_last_n_days_data(days=download_last_n_days)
         elif today_count > 0:
             logger.info(f"\n{'='*60}")
             logger.info(f"✅ EXISTING DATA FOUND: {today_count} 5-min candles for today")
@@ -989,7 +1138,10 @@ async def main():
     collector = NiftyDataCollector()
     
     # Only today's data + live feed
-    await collector.run(download_last_n_days=1, start_live=True)
+    try:
+        await collector.run(download_last_n_days=1, start_live=True)
+    finally:
+        collector.close()
 
 if __name__ == "__main__":
     try:
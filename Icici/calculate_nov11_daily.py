@@ -10,32 +10,34 @@ print("\n" + "="*80)
 print("📊 CALCULATING NOV 11, 2025 DAILY CANDLE")
 print("="*80 + "\n")
 
-# Get Nov 11 5-min data
+# Fold Nov 11 5-min data into the daily candle inside SQLite: only the aggregates
+# come back, not every 5-min row
 conn_5min = sqlite3.connect('NIFTY_5min_data.db')
-candles = conn_5min.execute('''
-    SELECT datetime, open, high, low, close, volume
-    FROM data_5min
-    WHERE datetime LIKE '2025-11-11%'
-    AND TIME(datetime) >= '09:15:00'
-    AND TIME(datetime) <= '15:30:00'
-    ORDER BY datetime
-''').fetchall()
+count, first, last, daily_open, daily_high, daily_low, daily_close, daily_volume = conn_5min.execute('''
+    WITH day AS (
+        SELECT datetime, open, high, low, close, volume
+        FROM data_5min
+        WHERE datetime LIKE '2025-11-11%'
+        AND TIME(datetime) >= '09:15:00'
+        AND TIME(datetime) <= '15:30:00'
+    )
+    SELECT COUNT(*), MIN(datetime), MAX(datetime),
+           (SELECT open FROM day ORDER BY datetime LIMIT 1),   -- First candle's open
+           MAX(high),                                          -- Highest high
+           MIN(low),                                           -- Lowest low
+           (SELECT close FROM day ORDER BY datetime DESC LIMIT 1),  -- Last candle's close
+           SUM(volume)                                         -- Total volume
+    FROM day
+''').fetchone()
 conn_5min.close()
 
-if not candles:
+if not count:
     print("❌ No 5-min data found for Nov 11, 2025")
     exit(1)
 
-print(f"📊 Found {len(candles)} 5-min candles for Nov 11, 2025")
-print(f"   First: {candles[0][0]}")
-print(f"   Last:  {candles[-1][0]}")
-
-# Calculate daily OHLC
-daily_open = candles[0][1]  # First candle's open
-daily_high = max(c[2] for c in candles)  # Highest high
-daily_low = min(c[3] for c in candles)   # Lowest low
-daily_close = candles[-1][4]  # Last candle's close
-daily_volume = sum(c[5] for c in candles)  # Total volume
+print(f"📊 Found {count} 5-min candles for Nov 11, 2025")
+print(f"   First: {first}")
+print(f"   Last:  {last}")
 
 print(f"\n📈 NOVEMBER 11, 2025 DAILY CANDLE:")
 print(f"   Open:   ₹{daily_open:.2f}")
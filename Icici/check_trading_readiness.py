@@ -7,6 +7,7 @@ import sqlite3
 import os
 from datetime import datetime
 import sys
+from dotenv import dotenv_values
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
@@ -17,13 +18,16 @@ print("="*80 + "\n")
 # Check 1: PDH/PDL from Nov 11
 print("📊 CHECK 1: Previous Day High/Low (PDH/PDL)")
 print("-" * 80)
+# One connection for all checks: the 15-min, 5-min and trades databases are attached
 conn = sqlite3.connect('NIFTY_1day_data.db')
+conn.execute("ATTACH DATABASE 'NIFTY_15min_data.db' AS d15")
+conn.execute("ATTACH DATABASE 'NIFTY_5min_data.db' AS d5")
+conn.execute("ATTACH DATABASE 'paper_trades.db' AS pt")
 nov11_data = conn.execute('''
     SELECT datetime, open, high, low, close 
     FROM data_1day 
     WHERE date(datetime) = '2025-11-11'
 ''').fetchone()
-conn.close()
 
 if nov11_data:
     print(f"✅ Nov 11 Daily Data Found:")
@@ -42,15 +46,20 @@ else:
 # Check 2: 15-min candles for Nov 11
 print(f"\n📊 CHECK 2: 15-Minute Candles for Super Pranni Signals")
 print("-" * 80)
-conn = sqlite3.connect('NIFTY_15min_data.db')
-candles_15min = conn.execute('''
-    SELECT COUNT(*) 
-    FROM data_15min 
-    WHERE date(datetime) = '2025-11-11'
-    AND TIME(datetime) >= '09:15:00'
-    AND TIME(datetime) <= '15:30:00'
-''').fetchone()[0]
-conn.close()
+# 15-min and 5-min counts (CHECK 3) in one query
+candles_15min, candles_5min = conn.execute('''
+    SELECT
+        (SELECT COUNT(*) 
+         FROM d15.data_15min 
+         WHERE date(datetime) = '2025-11-11'
+         AND TIME(datetime) >= '09:15:00'
+         AND TIME(datetime) <= '15:30:00'),
+        (SELECT COUNT(*) 
+         FROM d5.data_5min 
+         WHERE date(datetime) = '2025-11-11'
+         AND TIME(datetime) >= '09:15:00'
+         AND TIME(datetime) <= '15:30:00')
+''').fetchone()
 
 if candles_15min >= 24:  # Expect ~25 candles
     print(f"✅ {candles_15min} candles found (Expected: 25)")
@@ -60,15 +69,6 @@ else:
 # Check 3: 5-min candles for stop-loss
 print(f"\n📊 CHECK 3: 5-Minute Candles for Stop-Loss Monitoring")
 print("-" * 80)
-conn = sqlite3.connect('NIFTY_5min_data.db')
-candles_5min = conn.execute('''
-    SELECT COUNT(*) 
-    FROM data_5min 
-    WHERE date(datetime) = '2025-11-11'
-    AND TIME(datetime) >= '09:15:00'
-    AND TIME(datetime) <= '15:30:00'
-''').fetchone()[0]
-conn.close()
 
 if candles_5min >= 74:  # Expect ~75 candles
     print(f"✅ {candles_5min} candles found (Expected: 75)")
@@ -78,12 +78,11 @@ else:
 # Check 4: Real trades database
 print(f"\n📊 CHECK 4: Real Trades Database")
 print("-" * 80)
-conn = sqlite3.connect('paper_trades.db')
 cursor = conn.cursor()
 
 # Check if real_trades table exists
 table_exists = cursor.execute('''
-    SELECT name FROM sqlite_master 
+    SELECT name FROM pt.sqlite_master 
     WHERE type='table' AND name='real_trades'
 ''').fetchone()
 
@@ -91,7 +90,7 @@ if table_exists:
     print("✅ real_trades table exists")
     
     # Check columns
-    columns = cursor.execute("PRAGMA table_info(real_trades)").fetchall()
+    columns = cursor.execute("PRAGMA pt.table_info(real_trades)").fetchall()
     column_names = [col[1] for col in columns]
     
     required_columns = ['order_id', 'entry_order_status', 'exit_order_id', 
@@ -104,7 +103,7 @@ if table_exists:
         print(f"⚠️  Missing columns: {', '.join(missing)}")
     
     # Check for any open trades
-    open_trades = cursor.execute("SELECT COUNT(*) FROM real_trades WHERE status = 'OPEN'").fetchone()[0]
+    open_trades = cursor.execute("SELECT COUNT(*) FROM pt.real_trades WHERE status = 'OPEN'").fetchone()[0]
     if open_trades > 0:
         print(f"⚠️  {open_trades} OPEN position(s) found - will be monitored")
     else:
@@ -119,29 +118,28 @@ print(f"\n📊 CHECK 5: Configuration (.env file)")
 print("-" * 80)
 if os.path.exists('.env'):
     print("✅ .env file exists")
-    with open('.env', 'r') as f:
-        content = f.read()
-        has_api_key = 'ICICI_API_KEY=' in content and content.split('ICICI_API_KEY=')[1].split('\n')[0].strip() != ''
-        has_api_secret = 'ICICI_API_SECRET=' in content and content.split('ICICI_API_SECRET=')[1].split('\n')[0].strip() != ''
-        has_session = 'ICICI_SESSION_TOKEN=' in content and content.split('ICICI_SESSION_TOKEN=')[1].split('\n')[0].strip() != ''
-        has_paper_mode = 'PAPER_TRADING=' in content
-        
-        if has_api_key and has_api_secret:
-            print("✅ API credentials configured")
-        else:
-            print("❌ API credentials missing")
-        
-        if has_session:
-            print("✅ Session token configured")
+    env = dotenv_values('.env')  # parsed once into a dict
+    has_api_key = bool((env.get('ICICI_API_KEY') or '').strip())
+    has_api_secret = bool((env.get('ICICI_API_SECRET') or '').strip())
+    has_session = bool((env.get('ICICI_SESSION_TOKEN') or '').strip())
+    has_paper_mode = 'PAPER_TRADING' in env
+    
+    if has_api_key and has_api_secret:
+        print("✅ API credentials configured")
+    else:
+        print("❌ API credentials missing")
+    
+    if has_session:
+        print("✅ Session token configured")
+    else:
+        print("❌ Session token missing")
+    
+    if has_paper_mode:
+        paper_mode = (env['PAPER_TRADING'] or '').strip().lower()
+        if paper_mode == 'true':
+            print("⚠️  PAPER_TRADING=true (No real orders will be placed)")
         else:
-            print("❌ Session token missing")
-        
-        if has_paper_mode:
-            paper_mode = content.split('PAPER_TRADING=')[1].split('\n')[0].strip().lower()
-            if paper_mode == 'true':
-                print("⚠️  PAPER_TRADING=true (No real orders will be placed)")
-            else:
-                print("🔴 PAPER_TRADING=false (REAL ORDERS WILL BE PLACED)")
+            print("🔴 PAPER_TRADING=false (REAL ORDERS WILL BE PLACED)")
 else:
     print("❌ .env file NOT FOUND")
 
@@ -15,31 +15,18 @@ print("\n" + "="*80)
 print("🗑️  CLEANING NOVEMBER 11, 2025 DATA")
 print("="*80 + "\n")
 
-# Delete from 5-min
+# Delete from 5-min, 15-min and 1-day through one connection (the other two files
+# attached), all in one transaction
 conn = sqlite3.connect('NIFTY_5min_data.db')
-cursor = conn.cursor()
-cursor.execute("DELETE FROM data_5min WHERE datetime LIKE '2025-11-11%'")
-deleted_5min = cursor.rowcount
-conn.commit()
+conn.execute("ATTACH DATABASE 'NIFTY_15min_data.db' AS d15")
+conn.execute("ATTACH DATABASE 'NIFTY_1day_data.db' AS d1d")
+with conn:
+    deleted_5min = conn.execute("DELETE FROM data_5min WHERE datetime LIKE '2025-11-11%'").rowcount
+    deleted_15min = conn.execute("DELETE FROM d15.data_15min WHERE datetime LIKE '2025-11-11%'").rowcount
+    deleted_1day = conn.execute("DELETE FROM d1d.data_1day WHERE datetime LIKE '2025-11-11%'").rowcount
 conn.close()
 print(f"✅ Deleted {deleted_5min} candles from NIFTY_5min_data.db")
-
-# Delete from 15-min
-conn = sqlite3.connect('NIFTY_15min_data.db')
-cursor = conn.cursor()
-cursor.execute("DELETE FROM data_15min WHERE datetime LIKE '2025-11-11%'")
-deleted_15min = cursor.rowcount
-conn.commit()
-conn.close()
 print(f"✅ Deleted {deleted_15min} candles from NIFTY_15min_data.db")
-
-# Delete from 1-day
-conn = sqlite3.connect('NIFTY_1day_data.db')
-cursor = conn.cursor()
-cursor.execute("DELETE FROM data_1day WHERE datetime LIKE '2025-11-11%'")
-deleted_1day = cursor.rowcount
-conn.commit()
-conn.close()
 print(f"✅ Deleted {deleted_1day} candle from NIFTY_1day_data.db")
 
 print("\n" + "="*80)
@@ -76,14 +63,18 @@ candles_15min = conn.execute('''
 conn.close()
 
 print(f"📊 15-MIN CANDLES (Total: {len(candles_15min)}):")
-for i, row in enumerate(candles_15min, 1):
-    print(f"   {i:2d}. {row[0]} | O: ₹{row[1]:7.2f}, H: ₹{row[2]:7.2f}, L: ₹{row[3]:7.2f}, C: ₹{row[4]:7.2f}")
+# One write for the whole listing rather than a print() per candle
+sys.stdout.write(''.join(
+    f"   {i:2d}. {row[0]} | O: ₹{row[1]:7.2f}, H: ₹{row[2]:7.2f}, L: ₹{row[3]:7.2f}, C: ₹{row[4]:7.2f}\n"
+    for i, row in enumerate(candles_15min, 1)
+))
 
 if candles_15min:
-    daily_open = candles_15min[0][1]
-    daily_high = max(c[2] for c in candles_15min)
-    daily_low = min(c[3] for c in candles_15min)
-    daily_close = candles_15min[-1][4]
+    _, opens, highs, lows, closes = zip(*candles_15min)
+    daily_open = opens[0]
+    daily_high = max(highs)
+    daily_low = min(lows)
+    daily_close = closes[-1]
     
     print(f"\n" + "="*80)
     print(f"📈 NOVEMBER 11, 2025 DAILY LEVELS")
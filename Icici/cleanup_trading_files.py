@@ -6,8 +6,10 @@ Trading Folder Cleanup Script
 - Preserves databases, logs, and utilities
 """
 
+import errno
 import os
 import shutil
+import sys
 from datetime import datetime
 
 # Essential files to KEEP (current trading system)
@@ -133,6 +135,28 @@ KHUSI_FILES = {
     'khusi_model_daily.pkl',
 }
 
+# Archive groups, in the order they're reported
+ARCHIVE_GROUPS = (
+    ("🤖 Moving old trading bots...", OLD_TRADING_BOTS),
+    ("🔧 Moving utility/analysis scripts...", UTILITY_SCRIPTS),
+    ("📜 Moving old batch/script files...", OLD_BATCH_FILES),
+    ("📄 Moving old documentation...", OLD_DOCS),
+    ("💼 Moving Khusi investment model files...", KHUSI_FILES),
+)
+
+
+def archive_file(src, dst):
+    """
+    Move a file into the archive. archive/ sits under the folder, so this is a plain
+    rename; shutil.move's copy + delete is only needed across devices
+    """
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
 
 def cleanup_trading_folder():
     """Main cleanup function"""
@@ -149,57 +173,20 @@ def cleanup_trading_folder():
     print(f"📁 Archive directory: {archive_dir}")
     print()
     
-    moved_count = 0
-    
-    # Move old trading bots
-    print("🤖 Moving old trading bots...")
-    for filename in OLD_TRADING_BOTS:
-        filepath = os.path.join(base_dir, filename)
-        if os.path.exists(filepath):
-            shutil.move(filepath, os.path.join(archive_dir, filename))
-            print(f"   ✅ {filename}")
-            moved_count += 1
-    print()
-    
-    # Move utility scripts
-    print("🔧 Moving utility/analysis scripts...")
-    for filename in UTILITY_SCRIPTS:
-        filepath = os.path.join(base_dir, filename)
-        if os.path.exists(filepath):
-            shutil.move(filepath, os.path.join(archive_dir, filename))
-            print(f"   ✅ {filename}")
-            moved_count += 1
-    print()
-    
-    # Move old batch files
-    print("📜 Moving old batch/script files...")
-    for filename in OLD_BATCH_FILES:
-        filepath = os.path.join(base_dir, filename)
-        if os.path.exists(filepath):
-            shutil.move(filepath, os.path.join(archive_dir, filename))
-            print(f"   ✅ {filename}")
-            moved_count += 1
-    print()
+    # One directory read: which archive candidates are actually here
+    with os.scandir(base_dir) as entries:
+        present = {entry.name for entry in entries if entry.is_file(follow_symlinks=False)}
     
-    # Move old documentation
-    print("📄 Moving old documentation...")
-    for filename in OLD_DOCS:
-        filepath = os.path.join(base_dir, filename)
-        if os.path.exists(filepath):
-            shutil.move(filepath, os.path.join(archive_dir, filename))
-            print(f"   ✅ {filename}")
-            moved_count += 1
-    print()
+    moved_count = 0
     
-    # Move Khusi investment files
-    print("💼 Moving Khusi investment model files...")
-    for filename in KHUSI_FILES:
-        filepath = os.path.join(base_dir, filename)
-        if os.path.exists(filepath):
-            shutil.move(filepath, os.path.join(archive_dir, filename))
-            print(f"   ✅ {filename}")
-            moved_count += 1
-    print()
+    for heading, filenames in ARCHIVE_GROUPS:
+        # Each group is reported with one write once its files are moved
+        report = [f"{heading}\n"]
+        for filename in sorted(filenames & present):
+            archive_file(os.path.join(base_dir, filename), os.path.join(archive_dir, filename))
+            report.append(f"   ✅ {filename}\n")
+        moved_count += len(report) - 1
+        sys.stdout.write(''.join(report) + "\n")
     
     # Summary
     print("=" * 80)
@@ -16,50 +16,45 @@ print("\n" + "="*80)
 print("🧹 CLOSING OLD PAPER TRADE POSITIONS")
 print("="*80 + "\n")
 
-# Get all open positions
+# Partial index over just the OPEN rows, so open-position lookups skip closed history
+cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_real_trades_open
+    ON real_trades(status) WHERE status = 'OPEN'
+''')
+
+# Close all open positions and get them back from the same statement
 open_positions = cursor.execute('''
-    SELECT id, direction, strike, entry_premium, timestamp, quantity
-    FROM real_trades 
+    UPDATE real_trades 
+    SET status = 'CLOSED',
+        exit_timestamp = ?,
+        exit_premium = 0,
+        pnl = 0,
+        exit_order_id = 'PAPER_TRADE_CLEANUP',
+        exit_order_status = 'CLEANED',
+        exit_reason = 'Paper trade cleanup for fresh start'
     WHERE status = 'OPEN'
-    ORDER BY timestamp DESC
-''').fetchall()
+    RETURNING id, direction, strike, entry_premium, timestamp, quantity
+''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),)).fetchall()
+conn.commit()
 
 if not open_positions:
     print("✅ No open positions found - Already clean")
 else:
+    # RETURNING order is unspecified; list newest first as before
+    open_positions.sort(key=lambda pos: pos[4] or '', reverse=True)
     print(f"Found {len(open_positions)} OPEN position(s):\n")
     for pos in open_positions:
         print(f"  ID: {pos[0]} | {pos[1]} | Strike: {pos[2]} | Entry: ₹{pos[3]:.2f} @ {pos[4]}")
     
     print(f"\n🔄 Marking all as CLOSED (Paper trades)...\n")
-    
-    # Update all open positions to CLOSED
-    cursor.execute('''
-        UPDATE real_trades 
-        SET status = 'CLOSED',
-            exit_timestamp = ?,
-            exit_premium = 0,
-            pnl = 0,
-            exit_order_id = 'PAPER_TRADE_CLEANUP',
-            exit_order_status = 'CLEANED',
-            exit_reason = 'Paper trade cleanup for fresh start'
-        WHERE status = 'OPEN'
-    ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
-    
-    rows_updated = cursor.rowcount
-    conn.commit()
-    
-    print(f"✅ Closed {rows_updated} position(s)")
-
-conn.close()
+    print(f"✅ Closed {len(open_positions)} position(s)")
 
 print("\n" + "="*80)
 print("✅ DATABASE CLEAN - READY FOR FRESH REAL TRADES")
 print("="*80 + "\n")
 
 # Verify
-conn = sqlite3.connect('paper_trades.db')
-remaining_open = conn.execute('SELECT COUNT(*) FROM real_trades WHERE status = "OPEN"').fetchone()[0]
+remaining_open = conn.execute("SELECT COUNT(*) FROM real_trades WHERE status = 'OPEN'").fetchone()[0]
 conn.close()
 
 if remaining_open == 0:
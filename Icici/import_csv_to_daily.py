@@ -18,7 +18,9 @@ print("="*80 + "\n")
 csv_file = 'Nifty 50 Historical Data (1).csv'
 print(f"📂 Reading {csv_file}...")
 
-df_csv = pd.read_csv(csv_file)
+# Only the columns used below; the C parser strips the thousands separators from
+# the quoted prices itself
+df_csv = pd.read_csv(csv_file, usecols=['Date', 'Price', 'Open', 'High', 'Low', 'Vol.'], thousands=',')
 print(f"✅ Loaded {len(df_csv):,} rows from CSV")
 
 # Show sample data
@@ -31,28 +33,23 @@ print("\n🔧 Cleaning and parsing data...")
 # Convert Date column (DD-MM-YYYY format)
 df_csv['datetime'] = pd.to_datetime(df_csv['Date'], format='%d-%m-%Y')
 
-# Clean numeric columns (remove commas and convert)
-def clean_price(value):
-    if pd.isna(value):
-        return 0.0
-    return float(str(value).replace(',', ''))
-
-df_csv['open'] = df_csv['Open'].apply(clean_price)
-df_csv['high'] = df_csv['High'].apply(clean_price)
-df_csv['low'] = df_csv['Low'].apply(clean_price)
-df_csv['close'] = df_csv['Price'].apply(clean_price)  # Price is the close
-
-# Volume - convert M to actual number
-def clean_volume(value):
-    if pd.isna(value):
-        return 0
-    value_str = str(value).replace('M', '').replace(',', '')
-    try:
-        return int(float(value_str) * 1_000_000)
-    except:
-        return 0
-
-df_csv['volume'] = df_csv['Vol.'].apply(clean_volume)
+# Clean numeric columns (remove any commas the parser left and convert), a whole column at a time
+def clean_price(column):
+    if not pd.api.types.is_numeric_dtype(column):
+        column = column.astype(str).str.replace(',', '', regex=False)
+    return column.astype(float).fillna(0.0)
+
+df_csv['open'] = clean_price(df_csv['Open'])
+df_csv['high'] = clean_price(df_csv['High'])
+df_csv['low'] = clean_price(df_csv['Low'])
+df_csv['close'] = clean_price(df_csv['Price'])  # Price is the close
+
+# Volume - convert M to actual number (unparseable or missing volumes become 0)
+def clean_volume(column):
+    value_str = column.astype(str).str.replace('M', '', regex=False).str.replace(',', '', regex=False)
+    return (pd.to_numeric(value_str, errors='coerce') * 1_000_000).fillna(0).astype('int64')
+
+df_csv['volume'] = clean_volume(df_csv['Vol.'])
 
 # Format datetime as string
 df_csv['datetime'] = df_csv['datetime'].dt.strftime('%Y-%m-%d 00:00:00')
@@ -69,16 +66,16 @@ existing_dates = pd.read_sql_query('SELECT datetime FROM data_1day', conn)
 print(f"\n📊 Existing database has {len(existing_dates):,} records")
 print(f"   Date range: {existing_dates['datetime'].min()} to {existing_dates['datetime'].max()}")
 
-# Find missing dates (in CSV but not in database)
-existing_dates_set = set(existing_dates['datetime'])
-csv_dates_set = set(df_csv['datetime'])
+# Find missing dates (in CSV but not in database): one vectorized lookup of the CSV
+# dates against the database's, used for both the missing and the update split
+in_db = df_csv['datetime'].isin(existing_dates['datetime']).to_numpy()
+df_missing = df_csv[~in_db]
 
-missing_in_db = csv_dates_set - existing_dates_set
-print(f"\n🔍 Found {len(missing_in_db):,} dates in CSV that are missing in database")
+missing_count = df_missing['datetime'].nunique()
+print(f"\n🔍 Found {missing_count:,} dates in CSV that are missing in database")
 
-if len(missing_in_db) > 0:
+if missing_count > 0:
     # Filter CSV to only missing dates
-    df_missing = df_csv[df_csv['datetime'].isin(missing_in_db)].copy()
     df_missing = df_missing.sort_values('datetime')
     
     print(f"\n📥 Importing {len(df_missing):,} missing records...")
@@ -95,24 +92,20 @@ else:
 
 # Update existing records if CSV has different values
 print("\n🔄 Checking for records to update...")
-df_to_update = df_csv[df_csv['datetime'].isin(existing_dates_set)].copy()
+df_to_update = df_csv[in_db]
 
 if len(df_to_update) > 0:
     print(f"   Found {len(df_to_update):,} records that exist in both CSV and database")
     print("   Updating these records with CSV data...")
     
+    # One prepared UPDATE run over all rows, in one transaction
     cursor = conn.cursor()
-    updated_count = 0
-    
-    for _, row in df_to_update.iterrows():
-        cursor.execute('''
-            UPDATE data_1day 
-            SET open=?, high=?, low=?, close=?, volume=?
-            WHERE datetime=?
-        ''', (row['open'], row['high'], row['low'], row['close'], 
-              row['volume'], row['datetime']))
-        if cursor.rowcount > 0:
-            updated_count += 1
+    cursor.executemany('''
+        UPDATE data_1day 
+        SET open=?, high=?, low=?, close=?, volume=?
+        WHERE datetime=?
+    ''', df_to_update[['open', 'high', 'low', 'close', 'volume', 'datetime']].itertuples(index=False, name=None))
+    updated_count = cursor.rowcount  # rows changed across all executions
     
     conn.commit()
     print(f"✅ Updated {updated_count:,} records")
@@ -31,42 +31,48 @@ print(f"   To:   {df_15min['datetime'].max()}")
 # Convert datetime to pandas datetime
 df_15min['datetime'] = pd.to_datetime(df_15min['datetime'])
 
-# Extract date only
-df_15min['date'] = df_15min['datetime'].dt.date
+# Day of each candle as datetime64[D] (plain integers, not Python date objects)
+day_key = df_15min['datetime'].to_numpy().astype('datetime64[D]')
 
-# Group by date and aggregate
+# Group by date and aggregate (rows are already in datetime order, so no re-sort)
 print("\n📊 Aggregating to daily candles...")
-daily_data = df_15min.groupby('date').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).reset_index()
-
-# Convert date back to datetime string
-daily_data['datetime'] = pd.to_datetime(daily_data['date']).dt.strftime('%Y-%m-%d 00:00:00')
-daily_data = daily_data[['datetime', 'open', 'high', 'low', 'close', 'volume']]
+daily_data = df_15min.groupby(day_key, sort=False).agg(
+    open=('open', 'first'),
+    high=('high', 'max'),
+    low=('low', 'min'),
+    close=('close', 'last'),
+    volume=('volume', 'sum')
+)
+
+# Day back to the datetime string, for all days at once
+daily_data.insert(0, 'datetime', daily_data.index.astype(str) + ' 00:00:00')
+daily_data = daily_data.reset_index(drop=True)
 
 print(f"✅ Created {len(daily_data):,} daily candles")
 
-# Save to database
-conn_daily = sqlite3.connect('NIFTY_1day_data.db')
-cursor = conn_daily.cursor()
-
-# Clear existing data
-cursor.execute('DELETE FROM data_1day')
-print("\n🗑️  Cleared existing daily data")
-
-# Insert new data
-daily_data.to_sql('data_1day', conn_daily, if_exists='append', index=False)
-conn_daily.commit()
-conn_daily.close()
+# Save to database: clear and refill in one explicit write transaction (the write
+# lock is taken up front, one commit at the end, rolled back as a whole on error)
+conn_daily = sqlite3.connect('NIFTY_1day_data.db', isolation_level=None)
+conn_daily.execute('PRAGMA cache_size=-65536')
+conn_daily.execute('BEGIN IMMEDIATE')
+try:
+    # Clear existing data
+    conn_daily.execute('DELETE FROM data_1day')
+    print("\n🗑️  Cleared existing daily data")
+    
+    # Insert new data
+    conn_daily.executemany('''
+        INSERT INTO data_1day (datetime, open, high, low, close, volume)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', daily_data.itertuples(index=False, name=None))
+    conn_daily.execute('COMMIT')
+except Exception:
+    conn_daily.execute('ROLLBACK')
+    raise
 
 print(f"✅ Saved {len(daily_data):,} daily candles to NIFTY_1day_data.db")
 
 # Verify
-conn_daily = sqlite3.connect('NIFTY_1day_data.db')
 result = conn_daily.execute('''
     SELECT MIN(datetime), MAX(datetime), COUNT(*) 
     FROM data_1day
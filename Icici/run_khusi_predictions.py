@@ -61,36 +61,52 @@ print(f"✅ Loaded {len(df)} days of data")
 ema_periods = [5, 9, 21, 50, 100, 200]
 print(f"\n📈 Calculating EMAs: {ema_periods}")
 
+# Every indicator below is only read at the final bar, so compute just those
+# values from the close/volume arrays instead of building full 250-row columns
+close = df['close'].to_numpy(dtype=float)
+volume = df['volume'].to_numpy(dtype=float)
+
+# EMA at the last bar (same recursion as ewm(span=period, adjust=False))
+def ema_last(values, period):
+    alpha = 2 / (period + 1)
+    ema = values[0]
+    for value in values[1:]:
+        ema = (1 - alpha) * ema + alpha * value
+    return ema
+
+# Calculate RSI (simple averages of the last `period` gains/losses)
+def calculate_rsi(data, period=14):
+    if len(data) <= period:
+        return np.nan
+    delta = np.diff(data[-(period + 1):])
+    gain = np.where(delta > 0, delta, 0).mean()
+    loss = np.where(delta < 0, -delta, 0).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.float64(gain) / loss
+    return 100 - (100 / (1 + rs))
+
+# Percent change over the last `period` bars
+def momentum_last(data, period):
+    return (data[-1] / data[-1 - period] - 1) * 100 if len(data) > period else np.nan
+
+# Current values: the last row as a plain dict, plus the last-bar indicators
+latest = df.iloc[-1].to_dict()
 for period in ema_periods:
-    df[f'ema_{period}'] = df['close'].ewm(span=period, adjust=False).mean()
-
-# Calculate EMA distances
-df['ema_dist_100_200'] = ((df['ema_100'] - df['ema_200']) / df['ema_200']) * 100
-df['ema_dist_50_100'] = ((df['ema_50'] - df['ema_100']) / df['ema_100']) * 100
-df['ema_dist_21_50'] = ((df['ema_21'] - df['ema_50']) / df['ema_50']) * 100
+    latest[f'ema_{period}'] = ema_last(close, period)
 
-# Calculate RSI
-def calculate_rsi(data, period=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+# EMA distances
+for fast, slow in ((100, 200), (50, 100), (21, 50)):
+    latest[f'ema_dist_{fast}_{slow}'] = ((latest[f'ema_{fast}'] - latest[f'ema_{slow}']) / latest[f'ema_{slow}']) * 100
 
-df['rsi_14'] = calculate_rsi(df['close'], 14)
+latest['rsi_14'] = calculate_rsi(close, 14)
 
-# Calculate momentum indicators
-df['momentum_5'] = df['close'].pct_change(5) * 100
-df['momentum_10'] = df['close'].pct_change(10) * 100
-df['momentum_20'] = df['close'].pct_change(20) * 100
+# Momentum indicators
+for period in (5, 10, 20):
+    latest[f'momentum_{period}'] = momentum_last(close, period)
 
 # Volume analysis
-df['volume_ma_20'] = df['volume'].rolling(20).mean()
-df['volume_ratio'] = df['volume'] / df['volume_ma_20']
-
-# Current values
-latest = df.iloc[-1]
+latest['volume_ma_20'] = volume[-20:].mean() if len(volume) >= 20 else np.nan
+latest['volume_ratio'] = volume[-1] / latest['volume_ma_20']
 current_price = latest['close']
 
 print(f"\n📊 CURRENT MARKET STATUS")
@@ -109,8 +125,9 @@ else:
     distance_to_critical = critical_threshold - latest['ema_dist_100_200']
     print(f"   ✅ Distance to critical: {distance_to_critical:.3f}%")
 
-# Prepare features for prediction
-feature_data = latest[feature_cols].values.reshape(1, -1)
+# Prepare features for prediction: the last-bar values as a 1 x n float32 array
+# (the gradient-boosted trees compare in float32 and would convert it on every call)
+feature_data = np.array([[latest[col] for col in feature_cols]], dtype=np.float32)
 
 # Make predictions
 pred_class = model.predict(feature_data)[0]
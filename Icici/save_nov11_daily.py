@@ -12,32 +12,33 @@ print("\n" + "="*80)
 print("📊 CALCULATING NOV 11 DAILY CANDLE FROM 15-MIN DATA")
 print("="*80 + "\n")
 
-# Get all 15-min candles for Nov 11
+# Fold Nov 11 15-min candles into the daily OHLCV inside SQLite (the datetime
+# range keeps the lookup on the datetime index)
 conn = sqlite3.connect('NIFTY_15min_data.db')
-candles = conn.execute('''
-    SELECT datetime, open, high, low, close, volume
-    FROM data_15min 
-    WHERE date(datetime) = '2025-11-11'
-    AND TIME(datetime) >= '09:15:00'
-    AND TIME(datetime) <= '15:30:00'
-    ORDER BY datetime
-''').fetchall()
+count, first, last, daily_open, daily_high, daily_low, daily_close, daily_volume = conn.execute('''
+    WITH day AS (
+        SELECT datetime, open, high, low, close, volume
+        FROM data_15min 
+        WHERE datetime >= '2025-11-11' AND datetime < '2025-11-12'
+        AND TIME(datetime) >= '09:15:00'
+        AND TIME(datetime) <= '15:30:00'
+    )
+    SELECT COUNT(*), MIN(datetime), MAX(datetime),
+           (SELECT open FROM day ORDER BY datetime LIMIT 1),
+           MAX(high), MIN(low),
+           (SELECT close FROM day ORDER BY datetime DESC LIMIT 1),
+           SUM(volume)
+    FROM day
+''').fetchone()
 conn.close()
 
-if not candles:
+if not count:
     print("❌ No 15-min candles found for Nov 11")
     exit(1)
 
-print(f"✅ Found {len(candles)} candles")
-print(f"   First: {candles[0][0]}")
-print(f"   Last:  {candles[-1][0]}")
-
-# Calculate daily OHLC
-daily_open = candles[0][1]
-daily_high = max(c[2] for c in candles)
-daily_low = min(c[3] for c in candles)
-daily_close = candles[-1][4]
-daily_volume = sum(c[5] for c in candles)
+print(f"✅ Found {count} candles")
+print(f"   First: {first}")
+print(f"   Last:  {last}")
 
 print(f"\n📈 DAILY CANDLE:")
 print(f"   Open:   ₹{daily_open:.2f}")